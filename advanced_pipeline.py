@@ -17,21 +17,34 @@ Key LangGraph concepts demonstrated:
 - State accumulation across steps
 - Conditional branching
 - Error handling nodes
-- Parallel processing simulation
+- Parallel fan-out with the Send API
 """
 
 import warnings
 # Suppress Pydantic V1 deprecation warnings for Python 3.14+
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*")
 
+import os
 import sys
-import json
+import orjson
 import re
-from typing import Literal, Optional
+import socket
+import asyncio
+import atexit
+import hashlib
+import operator
+import shutil
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Annotated, Literal, Optional, TypedDict
+from urllib.parse import urlsplit
 from datetime import datetime
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
+from langgraph.types import Send
+import httpx
+from openai import OpenAI, AsyncOpenAI
 
 # ============================================================
 # Configuration
@@ -39,13 +52,60 @@ from openai import OpenAI
 
 OLLAMA_BASE_URL = "http://localhost:11434/v1"
 OLLAMA_MODEL = "llama3.2:1b"
+# 4-bit build of the same model, used with --quant (ollama pull llama3.2:1b-instruct-q4_K_M)
+OLLAMA_QUANT_MODEL = "llama3.2:1b-instruct-q4_K_M"
+
+# Step 5 sends this many prompts at once. Ollama only batches them into a
+# single forward pass if the server was started with OLLAMA_NUM_PARALLEL
+# at least this large (and OLLAMA_MAX_LOADED_MODELS=1 keeps one copy resident).
+LLM_BATCH_SIZE = 3
+
+# Output budget per prompt type. Section analyses produce much longer answers
+# than requirement reviews, so short prompts are not held to the long budget.
+LLM_MAX_TOKENS = {
+    "section_analysis": 512,
+    "requirement_analysis": 384,
+}
+
+# How much of each section ends up in its step 4 prompt
+PROMPT_CONTENT_CHARS = 500
+PROMPT_MAX_ITEMS = 5
+
+# Step 5 runs Ollama in JSON mode; the expected shape is spelled out per prompt type
+ANALYSIS_SCHEMAS = {
+    "section_analysis": '{"summary": str, "key_points": [str], "priority": "High" | "Medium" | "Low", "risks": [str]}',
+    "requirement_analysis": '{"feasibility": str, "complexity": "Simple" | "Medium" | "Complex", "dependencies": [str], "estimated_hours": number}',
+}
+LLM_SYSTEM_PROMPTS = {
+    prompt_type: f"You are a technical analyst. Provide concise, structured analysis. Respond with a JSON object of the form {schema}"
+    for prompt_type, schema in ANALYSIS_SCHEMAS.items()
+}
+DEFAULT_SYSTEM_PROMPT = "You are a technical analyst. Provide concise, structured analysis. Respond in JSON format."
 
 def log(msg: str):
     print(msg)
     sys.stdout.flush()
 
+# Keep-alive sockets shared by all step 5 requests
+OLLAMA_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16)
+
+@lru_cache(maxsize=1)
 def get_client():
-    return OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+    return OpenAI(
+        base_url=OLLAMA_BASE_URL,
+        api_key="ollama",
+        http_client=httpx.Client(limits=OLLAMA_HTTP_LIMITS)
+    )
+
+@lru_cache(maxsize=1)
+def get_async_client():
+    # The pooled connections belong to the event loop that opens them,
+    # so use this client from a single asyncio.run() (see run_pipeline)
+    return AsyncOpenAI(
+        base_url=OLLAMA_BASE_URL,
+        api_key="ollama",
+        http_client=httpx.AsyncClient(limits=OLLAMA_HTTP_LIMITS)
+    )
 
 # ============================================================
 # Pipeline State - Accumulates data through all steps
@@ -57,72 +117,101 @@ class Section(BaseModel):
     content: str = ""
     subsections: list[str] = Field(default_factory=list)
 
-class PipelineState(BaseModel):
+def _merge_dict(left: dict, right: dict) -> dict:
+    """Reducer that merges dict updates from parallel nodes."""
+    return {**left, **right}
+
+class PipelineState(TypedDict, total=False):
     """
     Complete state for the document processing pipeline.
     Each step adds to or transforms this state.
+    
+    A TypedDict is a plain dict at runtime, so node updates are merged
+    without re-validating the large payload fields on every step.
     """
-    # Input
-    input_file: str = Field(default="", description="Path or content of input file")
+    # Input: path or content of input file
+    input_file: str
     
-    # Step 1: Raw document
-    raw_content: str = Field(default="", description="Raw document content")
+    # Step 1: Path of the raw document (the text itself is only read in step 2)
+    raw_path: str
     
-    # Step 2: Parsed JSON
-    parsed_json: dict = Field(default_factory=dict, description="Structured JSON from document")
+    # Step 2: Structured JSON from document
+    parsed_json: dict
     
-    # Step 3: Extracted sections
-    sections: list[dict] = Field(default_factory=list, description="Extracted sections")
+    # Step 3: Extracted sections (flat, in document order) plus the same
+    # entries split by type so later steps need not filter on "type"
+    sections: list[dict]
+    top_sections: list[dict]
+    subsections: list[dict]
     
-    # Step 4: Comparison prompts
-    comparison_prompts: list[dict] = Field(default_factory=list, description="Generated prompts for LLM")
+    # Step 4: Generated prompts for LLM
+    comparison_prompts: list[dict]
     
-    # Step 5: LLM responses
-    llm_responses: list[dict] = Field(default_factory=list, description="LLM analysis results")
+    # Step 5: LLM analysis results (appended to by parallel llm_one branches)
+    llm_responses: Annotated[list[dict], operator.add]
     
-    # Step 6: Schema with seeded data
-    schema_data: dict = Field(default_factory=dict, description="Schema populated with extracted data")
+    # Step 6: Schema populated with extracted data (statistics and LLM
+    # analyses are written by parallel nodes and merged key by key)
+    schema_data: Annotated[dict, _merge_dict]
     
-    # Step 7: Final merged output
-    final_output: dict = Field(default_factory=dict, description="Final merged result")
+    # Step 7: Final merged result
+    final_output: dict
     
-    # Metadata
-    current_step: str = Field(default="", description="Current processing step")
-    errors: list[str] = Field(default_factory=list, description="Any errors encountered")
-    processing_log: list[str] = Field(default_factory=list, description="Processing history")
-    started_at: str = Field(default="", description="Pipeline start time")
-    completed_at: str = Field(default="", description="Pipeline completion time")
+    # Metadata (errors/processing_log are append-only: nodes return new entries)
+    current_step: str            # Current processing step
+    errors: Annotated[list[str], operator.add]           # Any errors encountered
+    processing_log: Annotated[list[str], operator.add]   # Processing history
+    started_at: str              # Pipeline start time
+    completed_at: str            # Pipeline completion time
     
     # Retry/Recovery fields
-    retry_count: int = Field(default=0, description="Current retry attempt")
-    max_retries: int = Field(default=3, description="Maximum retries per step")
-    last_successful_step: str = Field(default="", description="Last step that completed successfully")
-    failed_step: str = Field(default="", description="Step that failed")
-    should_retry: bool = Field(default=False, description="Flag to trigger retry")
-    should_rollback: bool = Field(default=False, description="Flag to rollback to previous step")
+    retry_count: int             # Current retry attempt
+    max_retries: int             # Maximum retries per step
+    last_successful_step: str    # Last step that completed successfully
+    failed_step: str             # Step that failed
+    should_retry: bool           # Flag to trigger retry
+    should_rollback: bool        # Flag to rollback to previous step
+
+
+def create_initial_state(input_file: str = "") -> PipelineState:
+    """Create a pipeline state with every field set to its default."""
+    return {
+        "input_file": input_file,
+        "raw_path": "",
+        "parsed_json": {},
+        "sections": [],
+        "top_sections": [],
+        "subsections": [],
+        "comparison_prompts": [],
+        "llm_responses": [],
+        "schema_data": {},
+        "final_output": {},
+        "current_step": "",
+        "errors": [],
+        "processing_log": [],
+        "started_at": "",
+        "completed_at": "",
+        "retry_count": 0,
+        "max_retries": 3,
+        "last_successful_step": "",
+        "failed_step": "",
+        "should_retry": False,
+        "should_rollback": False
+    }
+
+
+class LLMTask(TypedDict):
+    """Payload sent to each parallel llm_one branch in step 5"""
+    prompt_data: dict
+    duplicates: list[dict]  # Other prompts with identical text; they share the result
 
 
 # ============================================================
 # Step 1: Load Document (Simulates PDF/File Loading)
 # ============================================================
 
-def step1_load_document(state: PipelineState) -> dict:
-    """
-    Step 1: Load and read the input document.
-    In production, this would use PyPDF2, pdfplumber, etc.
-    """
-    log("\n[Step 1] Loading document...")
-    
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 1 started: {datetime.now().isoformat()}")
-    
-    # Simulate loading a document (in production, read actual file)
-    # For demo, we'll use sample content
-    if state.input_file:
-        raw_content = state.input_file
-    else:
-        # Sample document for demonstration
-        raw_content = """
+# Sample document for demonstration
+SAMPLE_DOCUMENT = """
 # Project Requirements Document
 
 ## 1. Overview
@@ -163,16 +252,61 @@ The portal will serve as the primary interface for customer interactions.
 - Phase 2: Q2 2025 - Account Management
 - Phase 3: Q3 2025 - Full Launch
 """
+
+
+@lru_cache(maxsize=1)
+def _inline_document_dir() -> str:
+    """Per-process directory holding inline documents, removed at exit."""
+    path = tempfile.mkdtemp(prefix="pipeline_docs_")
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+@lru_cache(maxsize=8)
+def _document_path(input_file: str) -> str:
+    """
+    Return a file path for the input document.
+    An existing path is used as-is; inline content (or the sample document
+    when empty) is written to a file named by its hash, so the same text
+    always maps to the same file, even after this cache has evicted it.
+    """
+    if input_file and os.path.isfile(input_file):
+        return input_file
+    content = input_file or SAMPLE_DOCUMENT
+    doc_dir = _inline_document_dir()
+    path = os.path.join(doc_dir, hashlib.blake2b(content.encode(), digest_size=16).hexdigest() + ".md")
+    if not os.path.exists(path):
+        # Write aside and rename, so a concurrent run never reads a partial file
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="", dir=doc_dir, delete=False) as f:
+            f.write(content)
+        os.replace(f.name, path)
+    return path
+
+
+def step1_load_document(state: PipelineState) -> dict:
+    """
+    Step 1: Locate the input document.
+    Step 2 reads the text from raw_path, so the document body is never
+    stored in the pipeline state.
+    In production, this would use PyPDF2, pdfplumber, etc.
+    """
+    log("\n[Step 1] Loading document...")
+    
+    now = datetime.now().isoformat()
+    
+    # Inline content (or the built-in sample) is written to a temp file once,
+    # so only the path travels through the pipeline state
+    raw_path = _document_path(state["input_file"])
+    raw_size = os.path.getsize(raw_path)
     
-    log(f"    Loaded {len(raw_content)} characters")
-    processing_log.append(f"Loaded document: {len(raw_content)} chars")
+    log(f"    Loaded {raw_size} bytes")
     
     return {
-        "raw_content": raw_content,
+        "raw_path": raw_path,
         "current_step": "step1_load",
         "last_successful_step": "step1_load",
-        "processing_log": processing_log,
-        "started_at": datetime.now().isoformat(),
+        "processing_log": [f"Step 1 started: {now}", f"Loaded document: {raw_size} bytes"],
+        "started_at": now,
         "retry_count": 0  # Reset on success
     }
 
@@ -181,81 +315,98 @@ The portal will serve as the primary interface for customer interactions.
 # Step 2: Parse to Structured JSON
 # ============================================================
 
+# Structural markdown lines: "# title", "## section", "### subsection", "- item".
+# Everything between two matches is plain body text.
+_STRUCTURE_RE = re.compile(
+    r'^[^\S\n]*(?P<line>(?:(?P<hashes>#{1,3})|(?P<item>-))[^\S\n]+(?P<text>\S.*?))[^\S\n]*$',
+    re.M
+)
+# A non-blank body line without its surrounding whitespace
+_BODY_LINE_RE = re.compile(r'^[^\S\n]*(\S.*?)[^\S\n]*$', re.M)
+
+
 def step2_parse_to_json(state: PipelineState) -> dict:
     """
     Step 2: Parse raw document into structured JSON.
-    Identifies headers, sections, and content blocks.
+    Identifies headers, sections, and content blocks in a single regex pass.
     """
     log("\n[Step 2] Parsing to structured JSON...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 2 started: {datetime.now().isoformat()}")
+    now = datetime.now().isoformat()
     
-    content = state.raw_content
+    with open(state["raw_path"], encoding="utf-8", newline="") as f:
+        content = f.read()
     
     # Parse markdown-style document into structure
     parsed = {
         "title": "",
         "sections": [],
         "metadata": {
-            "parsed_at": datetime.now().isoformat(),
-            "total_lines": len(content.split('\n'))
+            "parsed_at": now,
+            "total_lines": content.count('\n') + 1
         }
     }
     
     current_section = None
     current_subsection = None
-    
-    for line in content.split('\n'):
-        line = line.strip()
+    content_lines = []  # Body lines of current_section, joined once on close
+    
+    def close_section():
+        if current_section:
+            current_section["content"] = "".join(f"{line}\n" for line in content_lines)
+            parsed["sections"].append(current_section)
+    
+    pos = 0
+    for match in _STRUCTURE_RE.finditer(content):
+        # Regular content between the previous structural line and this one
+        if current_section:
+            content_lines.extend(_BODY_LINE_RE.findall(content, pos, match.start()))
+        pos = match.end()
+        text = match["text"]
+        depth = len(match["hashes"] or "")
         
         # Main title (# Header)
-        if line.startswith('# ') and not line.startswith('## '):
-            parsed["title"] = line[2:].strip()
+        if depth == 1:
+            parsed["title"] = text
         
         # Section (## Header)
-        elif line.startswith('## '):
-            if current_section:
-                parsed["sections"].append(current_section)
+        elif depth == 2:
+            close_section()
             current_section = {
-                "title": line[3:].strip(),
+                "title": text,
                 "content": "",
                 "subsections": []
             }
             current_subsection = None
+            content_lines = []
         
         # Subsection (### Header)
-        elif line.startswith('### '):
+        elif depth == 3:
             if current_section:
                 current_subsection = {
-                    "title": line[4:].strip(),
+                    "title": text,
                     "items": []
                 }
                 current_section["subsections"].append(current_subsection)
         
         # List item
-        elif line.startswith('- '):
-            if current_subsection:
-                current_subsection["items"].append(line[2:].strip())
-            elif current_section:
-                current_section["content"] += line + "\n"
-        
-        # Regular content
-        elif line and current_section:
-            current_section["content"] += line + "\n"
+        elif current_subsection:
+            current_subsection["items"].append(text)
+        elif current_section:
+            content_lines.append(match["line"])
     
-    # Don't forget the last section
+    # Don't forget the trailing content and the last section
     if current_section:
-        parsed["sections"].append(current_section)
+        content_lines.extend(_BODY_LINE_RE.findall(content, pos))
+    close_section()
     
     log(f"    Parsed {len(parsed['sections'])} sections")
-    processing_log.append(f"Parsed {len(parsed['sections'])} sections")
     
     return {
         "parsed_json": parsed,
         "current_step": "step2_parse",
         "last_successful_step": "step2_parse",
-        "processing_log": processing_log,
+        "processing_log": [f"Step 2 started: {now}", f"Parsed {len(parsed['sections'])} sections"],
         "retry_count": 0
     }
 
@@ -271,39 +422,44 @@ def step3_extract_sections(state: PipelineState) -> dict:
     """
     log("\n[Step 3] Extracting sections and subsections...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 3 started: {datetime.now().isoformat()}")
+    now = datetime.now().isoformat()
     
     sections = []
-    parsed = state.parsed_json
+    top_sections = []
+    subsections = []
+    parsed = state["parsed_json"]
     
     for section in parsed.get("sections", []):
+        # Only the part of the text that step 4 puts in a prompt is kept
         section_data = {
             "type": "section",
             "title": section.get("title", ""),
-            "content": section.get("content", "").strip(),
+            "content_preview": section.get("content", "").strip()[:PROMPT_CONTENT_CHARS],
             "subsection_count": len(section.get("subsections", []))
         }
         sections.append(section_data)
+        top_sections.append(section_data)
         
         for subsection in section.get("subsections", []):
             subsection_data = {
                 "type": "subsection",
                 "parent": section.get("title", ""),
                 "title": subsection.get("title", ""),
-                "items": subsection.get("items", []),
+                "items": subsection.get("items", [])[:PROMPT_MAX_ITEMS],
                 "item_count": len(subsection.get("items", []))
             }
             sections.append(subsection_data)
+            subsections.append(subsection_data)
     
     log(f"    Extracted {len(sections)} total sections/subsections")
-    processing_log.append(f"Extracted {len(sections)} items")
     
     return {
         "sections": sections,
+        "top_sections": top_sections,
+        "subsections": subsections,
         "current_step": "step3_extract",
         "last_successful_step": "step3_extract",
-        "processing_log": processing_log,
+        "processing_log": [f"Step 3 started: {now}", f"Extracted {len(sections)} items"],
         "retry_count": 0
     }
 
@@ -319,12 +475,11 @@ def step4_generate_prompts(state: PipelineState) -> dict:
     """
     log("\n[Step 4] Generating analysis prompts...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 4 started: {datetime.now().isoformat()}")
+    now = datetime.now().isoformat()
     
     prompts = []
     
-    for section in state.sections:
+    for section in state["sections"]:
         if section["type"] == "section":
             prompt = f"""Analyze the following document section and provide:
 1. A brief summary (2-3 sentences)
@@ -333,7 +488,7 @@ def step4_generate_prompts(state: PipelineState) -> dict:
 4. Any potential risks or concerns
 
 Section: {section['title']}
-Content: {section['content'][:500]}..."""
+Content: {section['content_preview']}..."""
             prompts.append({
                 "section": section["title"],
                 "prompt": prompt,
@@ -341,7 +496,7 @@ Content: {section['content'][:500]}..."""
             })
         
         elif section["type"] == "subsection" and section.get("items"):
-            items_text = "\n".join(f"- {item}" for item in section["items"][:5])
+            items_text = "\n".join(f"- {item}" for item in section["items"])
             prompt = f"""Review these requirements and provide:
 1. Feasibility assessment
 2. Implementation complexity (Simple/Medium/Complex)
@@ -360,13 +515,12 @@ Requirements:
             })
     
     log(f"    Generated {len(prompts)} prompts")
-    processing_log.append(f"Generated {len(prompts)} prompts")
     
     return {
         "comparison_prompts": prompts,
         "current_step": "step4_prompts",
         "last_successful_step": "step4_prompts",
-        "processing_log": processing_log,
+        "processing_log": [f"Step 4 started: {now}", f"Generated {len(prompts)} prompts"],
         "retry_count": 0
     }
 
@@ -377,65 +531,130 @@ Requirements:
 
 def step5_run_llm(state: PipelineState) -> dict:
     """
-    Step 5: Execute LLM analysis for each prompt.
-    Uses Ollama for local processing.
+    Step 5: Start LLM analysis.
+    The prompts themselves are fanned out to parallel llm_one branches
+    by dispatch_llm; this node only marks the start of the step.
     """
     log("\n[Step 5] Running LLM analysis...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 5 started: {datetime.now().isoformat()}")
+    now = datetime.now().isoformat()
     
-    responses = []
-    client = get_client()
+    return {
+        "current_step": "step5_llm",
+        "processing_log": [f"Step 5 started: {now}"]
+    }
+
+
+# Parsed analyses keyed by _prompt_key, reused for repeated prompts in this
+# process. Kept in least-recently-used order and capped at ANALYSIS_CACHE_MAX.
+ANALYSIS_CACHE_MAX = 256
+_analysis_cache: dict[str, dict] = {}
+
+
+def _prompt_key(prompt_data: dict) -> str:
+    """Hash of everything that determines the LLM request for a prompt."""
+    request = f"{OLLAMA_MODEL}\0{prompt_data['type']}\0{prompt_data['prompt']}"
+    return hashlib.blake2b(request.encode(), digest_size=16).hexdigest()
+
+
+def dispatch_llm(state: PipelineState) -> list[Send] | str:
+    """
+    Fan out one llm_one branch per distinct prompt so LangGraph runs them
+    concurrently.
+    """
+    # Process first LLM_BATCH_SIZE prompts for demo (to save time)
+    prompts_to_process = state["comparison_prompts"][:LLM_BATCH_SIZE]
     
-    # Process first 3 prompts for demo (to save time)
-    prompts_to_process = state.comparison_prompts[:3]
+    if not prompts_to_process:
+        return "step5_collect"
     
     for i, prompt_data in enumerate(prompts_to_process):
         log(f"    Processing prompt {i+1}/{len(prompts_to_process)}: {prompt_data['section']}")
+    
+    # Identical prompts are sent once
+    unique = {}
+    for prompt_data in prompts_to_process:
+        unique.setdefault(_prompt_key(prompt_data), []).append(prompt_data)
+    
+    return [
+        Send("llm_one", {"prompt_data": group[0], "duplicates": group[1:]})
+        for group in unique.values()
+    ]
+
+
+async def llm_one(task: LLMTask) -> dict:
+    """
+    Run the LLM analysis for a single prompt (and any identical copies).
+    Results are merged into llm_responses by the list reducer.
+    """
+    prompt_data = task["prompt_data"]
+    key = _prompt_key(prompt_data)
+    outcome = None
+    
+    if key in _analysis_cache:
+        # Re-insert so the entry moves to the most recently used end
+        cached = _analysis_cache[key] = _analysis_cache.pop(key)
+        outcome = {"analysis": cached}
+    
+    else:
+        client = get_async_client()
         
         try:
-            response = client.chat.completions.create(
+            response = await client.chat.completions.create(
                 model=OLLAMA_MODEL,
                 temperature=0.3,
+                max_tokens=LLM_MAX_TOKENS.get(prompt_data["type"]),
+                response_format={"type": "json_object"},
                 messages=[
-                    {"role": "system", "content": "You are a technical analyst. Provide concise, structured analysis. Respond in JSON format."},
+                    {"role": "system", "content": LLM_SYSTEM_PROMPTS.get(prompt_data["type"], DEFAULT_SYSTEM_PROMPT)},
                     {"role": "user", "content": prompt_data["prompt"]}
                 ]
             )
+            llm_response = response.choices[0].message.content or ""
             
-            llm_response = response.choices[0].message.content
-            
-            # Try to parse as JSON, otherwise wrap in structure
+            # JSON mode guarantees an object; the fallback only covers
+            # a reply cut off by max_tokens
             try:
-                parsed_response = json.loads(llm_response)
-            except:
+                parsed_response = orjson.loads(llm_response)
+            except orjson.JSONDecodeError:
                 parsed_response = {"raw_analysis": llm_response}
+            else:
+                # Only complete JSON replies are cached; a truncated sample
+                # is used for this run and re-asked next time
+                if len(_analysis_cache) >= ANALYSIS_CACHE_MAX:
+                    _analysis_cache.pop(next(iter(_analysis_cache)))
+                _analysis_cache[key] = parsed_response
             
-            responses.append({
-                "section": prompt_data["section"],
-                "type": prompt_data["type"],
-                "analysis": parsed_response,
-                "processed_at": datetime.now().isoformat()
-            })
+            outcome = {"analysis": parsed_response}
             
         except Exception as e:
             log(f"    Error processing {prompt_data['section']}: {str(e)}")
-            responses.append({
-                "section": prompt_data["section"],
-                "type": prompt_data["type"],
-                "error": str(e),
-                "processed_at": datetime.now().isoformat()
-            })
+            outcome = {"error": str(e)}
     
-    log(f"    Completed {len(responses)} LLM analyses")
-    processing_log.append(f"LLM analyzed {len(responses)} sections")
+    now = datetime.now().isoformat()
+    results = [
+        {
+            "section": item["section"],
+            "type": item["type"],
+            **outcome,
+            "processed_at": now
+        }
+        for item in [prompt_data, *task.get("duplicates", [])]
+    ]
+    
+    return {"llm_responses": results}
+
+
+def step5_collect(state: PipelineState) -> dict:
+    """
+    Step 5 (join): Runs once all llm_one branches have finished.
+    """
+    log(f"    Completed {len(state['llm_responses'])} LLM analyses")
     
     return {
-        "llm_responses": responses,
         "current_step": "step5_llm",
         "last_successful_step": "step5_llm",
-        "processing_log": processing_log,
+        "processing_log": [f"LLM analyzed {len(state['llm_responses'])} sections"],
         "retry_count": 0
     }
 
@@ -444,63 +663,70 @@ def step5_run_llm(state: PipelineState) -> dict:
 # Step 6: Seed Schema with Results
 # ============================================================
 
-def step6_seed_schema(state: PipelineState) -> dict:
+def step6_compute_statistics(state: PipelineState) -> dict:
     """
-    Step 6: Create a schema and seed it with extracted data.
-    Builds the output structure.
+    Step 6a: Summarize the extracted sections.
+    Depends only on step 3, so it runs alongside steps 4-5 instead of
+    waiting for the LLM.
     """
-    log("\n[Step 6] Seeding schema with results...")
+    log("\n[Step 6a] Computing section statistics...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 6 started: {datetime.now().isoformat()}")
+    now = datetime.now().isoformat()
     
-    # Create comprehensive schema
     schema = {
         "document": {
-            "title": state.parsed_json.get("title", "Untitled"),
-            "processed_at": datetime.now().isoformat(),
-            "total_sections": len(state.parsed_json.get("sections", [])),
-            "total_items_analyzed": len(state.sections)
+            "title": state["parsed_json"].get("title", "Untitled"),
+            "processed_at": now,
+            "total_sections": len(state["parsed_json"].get("sections", [])),
+            "total_items_analyzed": len(state["sections"])
         },
-        "sections_summary": [],
-        "llm_analyses": [],
+        "sections_summary": [
+            {
+                "title": section["title"],
+                "has_subsections": section["subsection_count"] > 0,
+                "subsection_count": section["subsection_count"]
+            }
+            for section in state["top_sections"]
+        ],
         "statistics": {
-            "sections_count": 0,
-            "subsections_count": 0,
-            "total_requirements": 0
+            "sections_count": len(state["top_sections"]),
+            "subsections_count": len(state["subsections"]),
+            "total_requirements": sum(subsection["item_count"] for subsection in state["subsections"])
         }
     }
     
-    # Populate sections summary
-    for section in state.sections:
-        if section["type"] == "section":
-            schema["statistics"]["sections_count"] += 1
-            schema["sections_summary"].append({
-                "title": section["title"],
-                "has_subsections": section["subsection_count"] > 0,
-                "subsection_count": section["subsection_count"]
-            })
-        else:
-            schema["statistics"]["subsections_count"] += 1
-            schema["statistics"]["total_requirements"] += section.get("item_count", 0)
-    
-    # Add LLM analyses
-    for response in state.llm_responses:
-        if "error" not in response:
-            schema["llm_analyses"].append({
-                "section": response["section"],
-                "analysis_type": response["type"],
-                "result": response["analysis"]
-            })
+    return {
+        "schema_data": schema,
+        "processing_log": [f"Computed statistics for {len(state['sections'])} sections"]
+    }
+
+
+def step6_seed_schema(state: PipelineState) -> dict:
+    """
+    Step 6b: Seed the schema with the LLM analyses.
+    The statistics half of the schema comes from step6_compute_statistics.
+    """
+    log("\n[Step 6b] Seeding schema with results...")
+    
+    now = datetime.now().isoformat()
+    
+    llm_analyses = [
+        {
+            "section": response["section"],
+            "analysis_type": response["type"],
+            "result": response["analysis"]
+        }
+        for response in state["llm_responses"]
+        if "error" not in response
+    ]
     
-    log(f"    Schema populated with {len(schema['llm_analyses'])} analyses")
-    processing_log.append(f"Schema seeded with {len(schema['llm_analyses'])} analyses")
+    log(f"    Schema populated with {len(llm_analyses)} analyses")
     
     return {
-        "schema_data": schema,
+        "schema_data": {"llm_analyses": llm_analyses},
         "current_step": "step6_seed",
         "last_successful_step": "step6_seed",
-        "processing_log": processing_log,
+        "processing_log": [f"Step 6 started: {now}", f"Schema seeded with {len(llm_analyses)} analyses"],
         "retry_count": 0
     }
 
@@ -516,34 +742,33 @@ def step7_merge_finalize(state: PipelineState) -> dict:
     """
     log("\n[Step 7] Merging and finalizing output...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 7 started: {datetime.now().isoformat()}")
+    now = datetime.now().isoformat()
+    new_log = [f"Step 7 started: {now}", f"Step 7 completed: {now}"]
+    full_log = state["processing_log"] + new_log  # Full history for the report
     
     final_output = {
         "report": {
-            "title": f"Analysis Report: {state.schema_data.get('document', {}).get('title', 'Document')}",
-            "generated_at": datetime.now().isoformat(),
+            "title": f"Analysis Report: {state['schema_data'].get('document', {}).get('title', 'Document')}",
+            "generated_at": now,
             "pipeline_version": "1.0.0"
         },
         "summary": {
-            "document_title": state.schema_data.get("document", {}).get("title"),
-            "total_sections": state.schema_data.get("statistics", {}).get("sections_count", 0),
-            "total_subsections": state.schema_data.get("statistics", {}).get("subsections_count", 0),
-            "total_requirements": state.schema_data.get("statistics", {}).get("total_requirements", 0),
-            "analyses_performed": len(state.schema_data.get("llm_analyses", []))
+            "document_title": state["schema_data"].get("document", {}).get("title"),
+            "total_sections": state["schema_data"].get("statistics", {}).get("sections_count", 0),
+            "total_subsections": state["schema_data"].get("statistics", {}).get("subsections_count", 0),
+            "total_requirements": state["schema_data"].get("statistics", {}).get("total_requirements", 0),
+            "analyses_performed": len(state["schema_data"].get("llm_analyses", []))
         },
-        "detailed_analysis": state.schema_data.get("llm_analyses", []),
-        "sections_overview": state.schema_data.get("sections_summary", []),
+        "detailed_analysis": state["schema_data"].get("llm_analyses", []),
+        "sections_overview": state["schema_data"].get("sections_summary", []),
         "processing_metadata": {
-            "started_at": state.started_at,
-            "completed_at": datetime.now().isoformat(),
-            "steps_completed": len(processing_log),
-            "processing_log": processing_log
+            "started_at": state["started_at"],
+            "completed_at": now,
+            "steps_completed": len(full_log) - 1,  # Not counting the completion entry
+            "processing_log": full_log
         }
     }
     
-    processing_log.append(f"Step 7 completed: {datetime.now().isoformat()}")
-    
     log(f"    Final report generated")
     log(f"    Total sections: {final_output['summary']['total_sections']}")
     log(f"    Total requirements: {final_output['summary']['total_requirements']}")
@@ -553,8 +778,8 @@ def step7_merge_finalize(state: PipelineState) -> dict:
         "final_output": final_output,
         "current_step": "step7_merge",
         "last_successful_step": "step7_merge",
-        "completed_at": datetime.now().isoformat(),
-        "processing_log": processing_log,
+        "completed_at": now,
+        "processing_log": new_log,
         "retry_count": 0
     }
 
@@ -572,21 +797,18 @@ def handle_error(state: PipelineState) -> dict:
     """
     log("\n[Error Handler] Processing error...")
     
-    errors = state.errors.copy()
-    processing_log = state.processing_log.copy()
-    retry_count = state.retry_count
+    retry_count = state["retry_count"]
     
-    failed_step = state.current_step or state.failed_step
-    errors.append(f"Error at step: {failed_step} (attempt {retry_count + 1})")
-    processing_log.append(f"Error handler triggered for {failed_step}")
+    failed_step = state["current_step"] or state["failed_step"]
+    errors = [f"Error at step: {failed_step} (attempt {retry_count + 1})"]
+    triggered = f"Error handler triggered for {failed_step}"
     
     # Check if we can retry
-    if retry_count < state.max_retries:
-        log(f"    Retry {retry_count + 1}/{state.max_retries} - will retry {failed_step}")
-        processing_log.append(f"Scheduling retry {retry_count + 1} for {failed_step}")
+    if retry_count < state["max_retries"]:
+        log(f"    Retry {retry_count + 1}/{state['max_retries']} - will retry {failed_step}")
         return {
             "errors": errors,
-            "processing_log": processing_log,
+            "processing_log": [triggered, f"Scheduling retry {retry_count + 1} for {failed_step}"],
             "retry_count": retry_count + 1,
             "should_retry": True,
             "should_rollback": False,
@@ -594,12 +816,11 @@ def handle_error(state: PipelineState) -> dict:
         }
     
     # Max retries reached - try rollback
-    if state.last_successful_step:
-        log(f"    Max retries reached. Rolling back to {state.last_successful_step}")
-        processing_log.append(f"Rolling back to {state.last_successful_step}")
+    if state["last_successful_step"]:
+        log(f"    Max retries reached. Rolling back to {state['last_successful_step']}")
         return {
             "errors": errors,
-            "processing_log": processing_log,
+            "processing_log": [triggered, f"Rolling back to {state['last_successful_step']}"],
             "retry_count": 0,  # Reset for rollback
             "should_retry": False,
             "should_rollback": True,
@@ -608,10 +829,9 @@ def handle_error(state: PipelineState) -> dict:
     
     # No rollback possible - fail
     log("    No recovery possible. Pipeline failed.")
-    processing_log.append("Pipeline failed - no recovery possible")
     return {
         "errors": errors,
-        "processing_log": processing_log,
+        "processing_log": [triggered, "Pipeline failed - no recovery possible"],
         "current_step": "failed",
         "should_retry": False,
         "should_rollback": False
@@ -625,30 +845,26 @@ def retry_router(state: PipelineState) -> dict:
     """
     log("\n[Retry Router] Determining next action...")
     
-    processing_log = state.processing_log.copy()
-    
-    if state.should_retry:
-        log(f"    -> Retrying: {state.failed_step}")
-        processing_log.append(f"Retrying {state.failed_step}")
+    if state["should_retry"]:
+        log(f"    -> Retrying: {state['failed_step']}")
         return {
-            "processing_log": processing_log,
+            "processing_log": [f"Retrying {state['failed_step']}"],
             "should_retry": False,
-            "current_step": state.failed_step
+            "current_step": state["failed_step"]
         }
     
-    if state.should_rollback:
-        log(f"    -> Rolling back to: {state.last_successful_step}")
-        processing_log.append(f"Rolling back to {state.last_successful_step}")
+    if state["should_rollback"]:
+        log(f"    -> Rolling back to: {state['last_successful_step']}")
         return {
-            "processing_log": processing_log,
+            "processing_log": [f"Rolling back to {state['last_successful_step']}"],
             "should_rollback": False,
-            "current_step": state.last_successful_step,
+            "current_step": state["last_successful_step"],
             "retry_count": 0
         }
     
     # No action - proceed to end
     log("    -> No recovery action, ending pipeline")
-    return {"processing_log": processing_log}
+    return {}
 
 
 # ============================================================
@@ -657,19 +873,19 @@ def retry_router(state: PipelineState) -> dict:
 
 def route_after_load(state: PipelineState) -> Literal["parse", "error"]:
     """Route after document loading."""
-    if state.raw_content:
+    if state["raw_path"]:
         return "parse"
     return "error"
 
 def route_after_parse(state: PipelineState) -> Literal["extract", "error"]:
     """Route after parsing."""
-    if state.parsed_json.get("sections"):
+    if state["parsed_json"].get("sections"):
         return "extract"
     return "error"
 
 def route_after_llm(state: PipelineState) -> Literal["seed", "error"]:
     """Route after LLM processing."""
-    if state.llm_responses:
+    if state["llm_responses"]:
         return "seed"
     return "error"
 
@@ -678,13 +894,13 @@ def route_after_error(state: PipelineState) -> str:
     Route after error handling - determines retry, rollback, or end.
     Returns the node to transition to.
     """
-    if state.should_retry:
+    if state["should_retry"]:
         # Retry the failed step
-        return state.failed_step or "end"
+        return state["failed_step"] or "end"
     
-    if state.should_rollback:
+    if state["should_rollback"]:
         # Go back to last successful step
-        return state.last_successful_step or "end"
+        return state["last_successful_step"] or "end"
     
     # No recovery possible
     return "end"
@@ -700,7 +916,11 @@ def create_pipeline():
     
     Flow:
     START → step1_load → step2_parse → step3_extract → step4_prompts 
-         → step5_llm → step6_seed → step7_merge → END
+         → step5_llm ⇉ llm_one (one per prompt) → step5_collect
+         → step6_seed → step7_merge → END
+    
+    step3_extract also feeds step6_stats, which runs alongside steps 4-5;
+    step7_merge waits for both step6_seed and step6_stats.
     
     With error handling and retry/rollback:
     - On error: go to error_handler
@@ -716,6 +936,9 @@ def create_pipeline():
     builder.add_node("step3_extract", step3_extract_sections)
     builder.add_node("step4_prompts", step4_generate_prompts)
     builder.add_node("step5_llm", step5_run_llm)
+    builder.add_node("llm_one", llm_one)
+    builder.add_node("step5_collect", step5_collect)
+    builder.add_node("step6_stats", step6_compute_statistics)
     builder.add_node("step6_seed", step6_seed_schema)
     builder.add_node("step7_merge", step7_merge_finalize)
     builder.add_node("error_handler", handle_error)
@@ -739,15 +962,21 @@ def create_pipeline():
     
     # Linear flow for remaining steps
     builder.add_edge("step3_extract", "step4_prompts")
+    builder.add_edge("step3_extract", "step6_stats")
     builder.add_edge("step4_prompts", "step5_llm")
     
+    # Fan out one llm_one branch per prompt, then join in step5_collect
+    builder.add_conditional_edges("step5_llm", dispatch_llm, ["llm_one", "step5_collect"])
+    builder.add_edge("llm_one", "step5_collect")
+    
     builder.add_conditional_edges(
-        "step5_llm",
+        "step5_collect",
         route_after_llm,
         {"seed": "step6_seed", "error": "error_handler"}
     )
     
-    builder.add_edge("step6_seed", "step7_merge")
+    # Join: step 7 runs once both halves of the schema are in
+    builder.add_edge(["step6_seed", "step6_stats"], "step7_merge")
     builder.add_edge("step7_merge", END)
     
     # Error handler routes to retry_router
@@ -774,17 +1003,55 @@ def create_pipeline():
     return builder.compile()
 
 
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def get_pipeline():
+    """Return the compiled pipeline, building it on first use."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = create_pipeline()
+    return _pipeline
+
+
 # ============================================================
 # Run the Pipeline
 # ============================================================
 
-def check_ollama():
+@lru_cache(maxsize=1)
+def check_ollama() -> bool:
+    """Check if Ollama is running (cached)."""
+    # Opening a TCP connection to Ollama's port is enough to know it's up
+    url = urlsplit(OLLAMA_BASE_URL)
     try:
-        get_client().models.list()
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
         return True
-    except:
+    except OSError:
         return False
 
+async def run_pipeline(pipeline, initial_state: PipelineState) -> dict:
+    """Warm the connection pool and load the model, then run the pipeline."""
+    client = get_async_client()
+    # Warmup is best effort: if it fails (e.g. the model isn't pulled), step 5
+    # records the error per prompt and the pipeline still finishes
+    try:
+        await client.models.list()
+        # One-token request so Ollama has the model in memory before step 5
+        await client.chat.completions.create(
+            model=OLLAMA_MODEL,
+            max_tokens=1,
+            messages=[{"role": "user", "content": "."}]
+        )
+    except Exception as e:
+        log(f"Warning: model warmup failed ({e})")
+    try:
+        return await pipeline.ainvoke(initial_state)
+    finally:
+        # Close the pooled connections while their event loop is still running
+        await client.close()
+        get_async_client.cache_clear()
+
 def main():
     """Run the document processing pipeline."""
     
@@ -797,18 +1064,22 @@ def main():
         log("ERROR: Ollama not running! Start with: ollama serve")
         return
     log("Ollama connected!")
+    num_parallel = os.environ.get("OLLAMA_NUM_PARALLEL", "")
+    if not num_parallel.isdigit() or int(num_parallel) < LLM_BATCH_SIZE:
+        log(f"Tip: start 'ollama serve' with OLLAMA_NUM_PARALLEL={LLM_BATCH_SIZE} so step 5 prompts are batched together")
     
     log("\n" + "-" * 60)
     log("Starting pipeline...")
     log("-" * 60)
     
-    # Create and run the pipeline
-    pipeline = create_pipeline()
+    # Get (or build once) and run the pipeline
+    pipeline = get_pipeline()
     
     # Run with default sample document
-    initial_state = PipelineState()
+    initial_state = create_initial_state()
     
-    result = pipeline.invoke(initial_state)
+    # llm_one is an async node, so the graph must be driven asynchronously
+    result = asyncio.run(run_pipeline(pipeline, initial_state))
     
     # Display results
     log("\n" + "=" * 60)
@@ -841,8 +1112,8 @@ def main():
     
     # Save output to file
     output_file = "pipeline_output.json"
-    with open(output_file, "w") as f:
-        json.dump(final, f, indent=2)
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(final, option=orjson.OPT_INDENT_2))
     log(f"\n\nFull output saved to: {output_file}")
     
     log("\n" + "=" * 60)
@@ -851,5 +1122,7 @@ def main():
 
 
 if __name__ == "__main__":
+    if "--quant" in sys.argv:
+        OLLAMA_MODEL = OLLAMA_QUANT_MODEL
     main()
 
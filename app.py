@@ -9,16 +9,24 @@ import warnings
 # Suppress Pydantic V1 deprecation warnings for Python 3.14+
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*")
 
-from flask import Flask, render_template_string, request, jsonify, session
-from typing import Literal
-import json
+from flask import Flask, Response, request, jsonify, session, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from typing import Annotated, Literal
+import ast
+import asyncio
+import operator
+import orjson
+import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from pydantic import BaseModel, Field
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.memory import MemorySaver
-from openai import OpenAI
 import secrets
 
 # ============================================================
@@ -28,18 +36,110 @@ import secrets
 OLLAMA_BASE_URL = "http://localhost:11434/v1"
 OLLAMA_MODEL = "llama3.2:1b"
 
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify()/request.json via orjson, keeping Flask's sorted keys and fallbacks."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+app.json = OrjsonProvider(app)
+# Workers behind gunicorn (see wsgi.py) must share a key to read each other's sessions
+app.secret_key = os.environ.get("FLASK_SECRET_KEY") or secrets.token_hex(16)
+
+# openai and langgraph are imported on first use rather than at startup;
+# together they account for most of the import time of this module
 
+# One client (and its connection pool) shared by every request
+@lru_cache(maxsize=None)
 def get_client():
+    from openai import OpenAI
     return OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
 
+def get_async_client():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+
+# Status shown on the index page. Probes are cached for OLLAMA_STATUS_TTL
+# seconds and refreshed in the background once stale, so page loads only
+# wait on Ollama the very first time
+OLLAMA_STATUS_TTL = 5.0
+_ollama_status = {"ok": False, "checked_at": None, "refreshing": False}
+_ollama_status_lock = threading.Lock()
+
+def _probe_ollama():
+    try:
+        get_client().with_options(timeout=1.0, max_retries=0).models.list()
+        ok = True
+    except Exception:
+        ok = False
+    with _ollama_status_lock:
+        _ollama_status.update(ok=ok, checked_at=time.monotonic(), refreshing=False)
+    return ok
+
 def check_ollama():
+    with _ollama_status_lock:
+        checked_at = _ollama_status["checked_at"]
+        if checked_at is not None and time.monotonic() - checked_at < OLLAMA_STATUS_TTL:
+            return _ollama_status["ok"]
+        if checked_at is not None:
+            if not _ollama_status["refreshing"]:
+                _ollama_status["refreshing"] = True
+                threading.Thread(target=_probe_ollama, daemon=True).start()
+            return _ollama_status["ok"]
+    return _probe_ollama()
+
+# ============================================================
+# JSON extraction from LLM responses
+# ============================================================
+
+# Greedy fallback for replies the brace scanner can't make sense of
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+def extract_json(text: str) -> str | None:
+    """Return the first balanced {...} object in an LLM reply, or None."""
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    match = _JSON_RE.search(text)
+    return match.group() if match else None
+
+def parse_json_reply(text: str | None) -> dict | None:
+    """Decode the JSON object in an LLM reply, or None if there isn't one."""
+    raw = extract_json(text or "")
+    if raw is None:
+        return None
     try:
-        get_client().models.list()
-        return True
-    except:
-        return False
+        return orjson.loads(raw)
+    except ValueError:
+        match = _JSON_RE.search(text)
+        if match is None or match.group() == raw:
+            raise
+        return orjson.loads(match.group())
 
 # ============================================================
 # Example A: Simple Sentiment
@@ -51,20 +151,26 @@ class SimpleState(BaseModel):
     sentiment: str = "neutral"
     response: str = ""
 
-def simple_analyze(state: SimpleState) -> dict:
-    text = state.user_input.lower()
-    positive_words = {"good", "great", "love", "happy", "wonderful", "amazing", "excellent"}
-    negative_words = {"bad", "terrible", "hate", "sad", "awful", "horrible", "angry"}
-    words = set(text.split())
-    pos = len(words & positive_words)
-    neg = len(words & negative_words)
+POSITIVE_WORDS = frozenset({"good", "great", "love", "happy", "wonderful", "amazing", "excellent"})
+NEGATIVE_WORDS = frozenset({"bad", "terrible", "hate", "sad", "awful", "horrible", "angry"})
+
+@lru_cache(maxsize=1024)
+def score_sentiment(text: str) -> tuple[str, int]:
+    """Keyword-match sentiment for one text. Returns (sentiment, word_count)."""
+    words_list = text.lower().split()
+    words = set(words_list)
+    pos = 0 if words.isdisjoint(POSITIVE_WORDS) else len(words & POSITIVE_WORDS)
+    neg = 0 if words.isdisjoint(NEGATIVE_WORDS) else len(words & NEGATIVE_WORDS)
     if pos > neg:
         sentiment = "positive"
     elif neg > pos:
         sentiment = "negative"
     else:
         sentiment = "neutral"
-    word_count = len(text.split())
+    return sentiment, len(words_list)
+
+def simple_analyze(state: SimpleState) -> dict:
+    sentiment, word_count = score_sentiment(state.user_input)
     if sentiment == "positive":
         response = f"Great vibes! Your {word_count} words are full of positivity!"
     elif sentiment == "negative":
@@ -74,6 +180,7 @@ def simple_analyze(state: SimpleState) -> dict:
     return {"sentiment": sentiment, "word_count": word_count, "response": response}
 
 def create_simple_graph():
+    from langgraph.graph import StateGraph, START, END
     builder = StateGraph(SimpleState)
     builder.add_node("analyze", simple_analyze)
     builder.add_edge(START, "analyze")
@@ -90,29 +197,59 @@ class LLMState(BaseModel):
     confidence: float = 0.0
     reasoning: str = ""
 
+LLM_SENTIMENT_PROMPT = 'Analyze sentiment. Respond ONLY with JSON: {"sentiment": "positive/negative/neutral", "confidence": 0.0-1.0, "reasoning": "brief"}'
+
 def llm_analyze(state: LLMState) -> dict:
-    client = get_client()
-    response = client.chat.completions.create(
-        model=OLLAMA_MODEL, temperature=0,
-        messages=[
-            {"role": "system", "content": 'Analyze sentiment. Respond ONLY with JSON: {"sentiment": "positive/negative/neutral", "confidence": 0.0-1.0, "reasoning": "brief"}'},
-            {"role": "user", "content": state.user_input}
-        ]
-    )
+    sentiment, confidence, reasoning = llm_sentiment(state.user_input.strip(), OLLAMA_MODEL, LLM_SENTIMENT_PROMPT)
+    return {"sentiment": sentiment, "confidence": confidence, "reasoning": reasoning}
+
+# temperature=0 makes the reply deterministic, so repeated inputs are served
+# from here by both /api/llm and /api/llm_stream. Model and prompt are part
+# of the key so changing either misses.
+SENTIMENT_CACHE_MAX = 1024
+_sentiment_cache = {}  # (text, model, system prompt) -> (sentiment, confidence, reasoning)
+_sentiment_lock = threading.Lock()
+
+def cached_sentiment(text: str, model: str, system_prompt: str):
+    return _sentiment_cache.get((text, model, system_prompt))
+
+def remember_sentiment(text: str, model: str, system_prompt: str, result: dict) -> tuple[str, float, str]:
+    key = (text, model, system_prompt)
+    value = (result["sentiment"], result["confidence"], result["reasoning"])
+    with _sentiment_lock:
+        if key not in _sentiment_cache and len(_sentiment_cache) >= SENTIMENT_CACHE_MAX:
+            _sentiment_cache.pop(next(iter(_sentiment_cache)))
+        _sentiment_cache[key] = value
+    return value
+
+def llm_sentiment(text: str, model: str, system_prompt: str) -> tuple[str, float, str]:
+    hit = cached_sentiment(text, model, system_prompt)
+    if hit:
+        return hit
+    # Concurrent Flask requests already reach Ollama in parallel; start it with
+    # OLLAMA_NUM_PARALLEL > 1 so it serves them together
+    response = get_client().chat.completions.create(model=model, temperature=0, messages=[
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": text}
+    ])
+    return remember_sentiment(text, model, system_prompt, sentiment_from_reply(response.choices[0].message.content))
+
+def sentiment_from_reply(content: str) -> dict:
+    """Pull sentiment/confidence/reasoning out of the model's JSON reply."""
     try:
-        match = re.search(r'\{.*\}', response.choices[0].message.content, re.DOTALL)
-        if match:
-            data = json.loads(match.group())
+        data = parse_json_reply(content)
+        if data:
             return {
                 "sentiment": data.get("sentiment", "neutral"),
                 "confidence": data.get("confidence", 0.5),
                 "reasoning": data.get("reasoning", "")
             }
-    except:
+    except (ValueError, KeyError):
         pass
     return {"sentiment": "neutral", "confidence": 0.5, "reasoning": "Could not parse"}
     
 def create_llm_graph():
+    from langgraph.graph import StateGraph, START, END
     builder = StateGraph(LLMState)
     builder.add_node("analyze", llm_analyze)
     builder.add_edge(START, "analyze")
@@ -123,6 +260,11 @@ def create_llm_graph():
 # Example C & D: Chat
 # ============================================================
 
+# Only the most recent turns are sent to the model so prompt size (and
+# latency) stays flat as a conversation grows. Keep it even so the window
+# starts on a user message.
+MAX_HISTORY_MESSAGES = 20
+
 class ChatState(BaseModel):
     messages: list = Field(default_factory=list)
     current_input: str = ""
@@ -130,16 +272,17 @@ class ChatState(BaseModel):
 def chat_respond(state: ChatState) -> dict:
     client = get_client()
     msgs = [{"role": "system", "content": "You are helpful. Keep responses to 1-2 sentences."}]
-    msgs.extend(state.messages)
+    msgs.extend(state.messages[-MAX_HISTORY_MESSAGES:])
     msgs.append({"role": "user", "content": state.current_input})
     response = client.chat.completions.create(model=OLLAMA_MODEL, temperature=0.7, messages=msgs)
-    new_msgs = state.messages + [
+    # Return a new list; the state's history is graph input and is left untouched
+    return {"messages": state.messages + [
         {"role": "user", "content": state.current_input},
         {"role": "assistant", "content": response.choices[0].message.content}
-    ]
-    return {"messages": new_msgs}
+    ]}
 
 def create_chat_graph():
+    from langgraph.graph import StateGraph, START, END
     builder = StateGraph(ChatState)
     builder.add_node("respond", chat_respond)
     builder.add_edge(START, "respond")
@@ -147,30 +290,60 @@ def create_chat_graph():
     return builder.compile()
 
 # Persistent chat with checkpointer
-persistent_checkpointer = MemorySaver()
 def create_persistent_graph():
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.checkpoint.memory import MemorySaver
     builder = StateGraph(ChatState)
     builder.add_node("respond", chat_respond)
     builder.add_edge(START, "respond")
     builder.add_edge("respond", END)
-    return builder.compile(checkpointer=persistent_checkpointer)
-
-persistent_graph = create_persistent_graph()
+    return builder.compile(checkpointer=MemorySaver())
 
 # ============================================================
 # Example E: Tool Agent
 # ============================================================
 
+# Shared session so repeated weather lookups reuse the same connections
+_HTTP = requests.Session()
+_HTTP.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                                    max_retries=Retry(total=2, backoff_factor=0.1)))
+
+# Weather changes slowly, so lookups are cached per city. Fallback answers
+# expire sooner so a flaky wttr.in gets retried.
+WEATHER_TTL = 600
+WEATHER_FALLBACK_TTL = 60
+WEATHER_CACHE_MAX = 256
+
+_weather_cache = {}  # city (lowercase) -> (expires_at, weather)
+_weather_lock = threading.Lock()
+
 def get_real_weather(city: str) -> str:
-    """Fetch weather - tries real API first, falls back to mock data"""
+    """Fetch weather - cached, tries real API first, falls back to mock data"""
+    key = city.lower().strip()
+    now = time.monotonic()
+    with _weather_lock:
+        hit = _weather_cache.get(key)
+    if hit and hit[0] > now:
+        return hit[1]
+    
+    weather, live = fetch_weather(city)
+    with _weather_lock:
+        # Refreshing an expired entry reuses its slot; only a new city evicts
+        if key not in _weather_cache and len(_weather_cache) >= WEATHER_CACHE_MAX:
+            _weather_cache.pop(next(iter(_weather_cache)))
+        _weather_cache[key] = (now + (WEATHER_TTL if live else WEATHER_FALLBACK_TTL), weather)
+    return weather
+
+def fetch_weather(city: str) -> tuple[str, bool]:
+    """Uncached lookup. Returns (weather, True) from wttr.in or (fallback, False)."""
     try:
         # Try wttr.in with longer timeout
         url = f"https://wttr.in/{city}?format=%C+%t"
-        response = requests.get(url, timeout=10, headers={"User-Agent": "curl/7.0"})
+        response = _HTTP.get(url, timeout=10, headers={"User-Agent": "curl/7.0"})
         if response.status_code == 200 and len(response.text) < 100:
             weather = response.text.strip()
             if weather and "Unknown" not in weather:
-                return f"{city}: {weather}"
+                return f"{city}: {weather}", True
     except:
         pass
     
@@ -186,81 +359,162 @@ def get_real_weather(city: str) -> str:
     city_lower = city.lower().strip()
     for key, value in mock_data.items():
         if key in city_lower:
-            return f"{city}: {value} (cached)"
-    return f"{city}: Weather data unavailable - try Paris, London, Tokyo, New York"
+            return f"{city}: {value} (cached)", False
+    return f"{city}: Weather data unavailable - try Paris, London, Tokyo, New York", False
+
+_CALC_BINOPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_CALC_UNARYOPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+# Largest integer result (in bits) a power or product may produce. Checked
+# before evaluating, so nested powers like ((9**99)**99)**99 are rejected
+# instead of pinning the worker. Float overflow already raises OverflowError.
+CALC_MAX_BITS = 4096
+
+def _calc_too_big(op, left, right) -> bool:
+    """True if an int power/product would exceed CALC_MAX_BITS."""
+    if not (isinstance(left, int) and isinstance(right, int)):
+        return False
+    if isinstance(op, ast.Pow):
+        # A non-positive exponent or a base of -1/0/1 can't grow the result
+        if right <= 0 or abs(left) <= 1:
+            return False
+        return abs(left).bit_length() * right > CALC_MAX_BITS
+    if isinstance(op, ast.Mult):
+        return left.bit_length() + right.bit_length() > CALC_MAX_BITS
+    return False
+
+def _calc_eval(node):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _CALC_BINOPS:
+        left, right = _calc_eval(node.left), _calc_eval(node.right)
+        if _calc_too_big(node.op, left, right):
+            raise ValueError("result too large")
+        return _CALC_BINOPS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _CALC_UNARYOPS:
+        return _CALC_UNARYOPS[type(node.op)](_calc_eval(node.operand))
+    raise ValueError(f"unsupported expression: {ast.dump(node)}")
+
+@lru_cache(maxsize=256)
+def calculate(expr: str) -> str:
+    """Evaluate plain arithmetic without eval(). Returns "Error" for anything else."""
+    try:
+        return str(_calc_eval(ast.parse(expr.strip(), mode="eval").body))
+    except (SyntaxError, ValueError, TypeError, ZeroDivisionError, OverflowError, RecursionError):
+        # RecursionError: deeply nested input like "-" * 2000 + "1"
+        return "Error"
 
 TOOLS = {
     "get_current_time": lambda: datetime.now().strftime("%A, %B %d, %Y at %I:%M %p"),
-    "calculate": lambda expr: str(eval(expr)) if all(c in "0123456789+-*/().% " for c in expr) else "Error",
+    "calculate": calculate,
     "get_weather": get_real_weather
 }
 
 class AgentState(BaseModel):
     query: str = ""
-    steps: list = Field(default_factory=list)
+    steps: Annotated[list, operator.add] = Field(default_factory=list)  # nodes return only new steps
     tool_result: str = ""
     final_answer: str = ""
-    tool_name: str = ""
-    tool_args: str = ""
+    tool_calls: list = Field(default_factory=list)  # [tool name, args] pairs to run next
     iteration: int = 0
+    prefetched: dict = Field(default_factory=dict)  # city (lowercase) -> weather fetched ahead of time
+
+# "weather in Paris today", "weather for New York?" -> the city to prefetch.
+# The city is a run of words that stops at punctuation or a time word.
+WEATHER_QUERY_RE = re.compile(r"""
+    \bweather\b.*?\b(?:in|for|at)\s+
+    (?P<city>[A-Za-z][A-Za-z.'-]*
+        (?:[ ]+(?!(?:today|tonight|tomorrow|now|right|this|next|later|please)\b)[A-Za-z][A-Za-z.'-]*)*)
+""", re.IGNORECASE | re.VERBOSE)
 
-def agent_reason(state: AgentState) -> dict:
-    steps = state.steps.copy()
+def weather_key(city: str) -> str:
+    """Normalize a city name the same way for prefetching and for tool calls."""
+    return city.lower().strip(" .,'?!-")
+
+async def agent_reason(state: AgentState) -> dict:
     iteration = state.iteration + 1
     
     if iteration > 3:
-        steps.append("Max iterations reached")
-        return {"final_answer": state.tool_result or "Could not complete task.", "steps": steps, "iteration": iteration}
+        return {"final_answer": state.tool_result or "Could not complete task.", "steps": ["Max iterations reached"], "iteration": iteration}
     
     if state.tool_result:
-        steps.append("Got result, providing answer")
-        return {"final_answer": f"The answer is: {state.tool_result}", "steps": steps, "iteration": iteration}
+        return {"final_answer": f"The answer is: {state.tool_result}", "steps": ["Got result, providing answer"], "iteration": iteration}
     
-    client = get_client()
-    response = client.chat.completions.create(
-        model=OLLAMA_MODEL, temperature=0,
-        messages=[
-            {"role": "system", "content": 'Tools: get_current_time(), calculate(expression), get_weather(city). Respond ONLY JSON: {"thought":"...","tool":"name","args":"value"} OR {"thought":"...","answer":"final answer"}'},
-            {"role": "user", "content": f"Query: {state.query}"}
-        ]
-    )
+    # The async client is tied to this request's event loop, so close it here
+    async with get_async_client() as client:
+        llm_call = client.chat.completions.create(
+            model=OLLAMA_MODEL, temperature=0,
+            messages=[
+                {"role": "system", "content": 'Tools: get_current_time(), calculate(expression), get_weather(city). Respond ONLY JSON: {"thought":"...","tool":"name","args":"value"} OR {"thought":"...","tools":[{"tool":"name","args":"value"}]} OR {"thought":"...","answer":"final answer"}'},
+                {"role": "user", "content": f"Query: {state.query}"}
+            ]
+        )
+        
+        # Weather questions almost always end in get_weather, so fetch it
+        # while the LLM is still deciding instead of after
+        prefetched = {}
+        match = WEATHER_QUERY_RE.search(state.query)
+        if match:
+            city = match["city"].strip(" .'-")
+            response, weather = await asyncio.gather(llm_call, asyncio.to_thread(get_real_weather, city))
+            prefetched = {weather_key(city): weather}
+        else:
+            response = await llm_call
     
+    steps = []
     try:
-        match = re.search(r'\{.*\}', response.choices[0].message.content, re.DOTALL)
-        if match:
-            data = json.loads(match.group())
+        data = parse_json_reply(response.choices[0].message.content)
+        if data:
             steps.append(f"Thought: {data.get('thought', '')}")
             if "answer" in data:
                 return {"final_answer": data["answer"], "steps": steps, "iteration": iteration}
-            elif "tool" in data:
-                return {"tool_name": data["tool"], "tool_args": str(data.get("args", "")), "steps": steps, "iteration": iteration}
-    except:
+            calls = data.get("tools") or ([data] if "tool" in data else [])
+            tool_calls = [[call["tool"], str(call.get("args", ""))] for call in calls if isinstance(call, dict) and "tool" in call]
+            if tool_calls:
+                return {"tool_calls": tool_calls, "steps": steps, "iteration": iteration, "prefetched": prefetched}
+    except (ValueError, KeyError):
         pass
     
     return {"final_answer": response.choices[0].message.content, "steps": steps, "iteration": iteration}
 
-def agent_execute(state: AgentState) -> dict:
-    if state.tool_name in TOOLS:
-        steps = state.steps.copy()
-        steps.append(f"Tool: {state.tool_name}({state.tool_args})")
-        if state.tool_name == "get_current_time":
-            result = TOOLS["get_current_time"]()
-        elif state.tool_name == "calculate":
-            result = TOOLS["calculate"](state.tool_args)
+# Tool calls from one reasoning step run side by side, so a step that needs
+# several lookups takes as long as the slowest one
+_TOOL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-tool")
+
+def run_tool(name: str, args: str) -> str:
+    if name == "get_current_time":
+        return TOOLS[name]()
+    return TOOLS[name](args)
+
+async def agent_execute(state: AgentState) -> dict:
+    calls = [(name, args) for name, args in state.tool_calls if name in TOOLS]
+    if not calls:
+        return {}
+    loop = asyncio.get_running_loop()
+    pending = []
+    for name, args in calls:
+        if name == "get_weather" and weather_key(args) in state.prefetched:
+            pending.append(asyncio.sleep(0, state.prefetched[weather_key(args)]))
         else:
-            result = TOOLS["get_weather"](state.tool_args)
-        steps.append(f"Result: {result}")
-        return {"tool_result": result, "tool_name": "", "steps": steps}
-    return {}
+            pending.append(loop.run_in_executor(_TOOL_POOL, run_tool, name, args))
+    results = await asyncio.gather(*pending)
+    steps = []
+    for (name, args), result in zip(calls, results):
+        steps += [f"Tool: {name}({args})", f"Result: {result}"]
+    return {"tool_result": "; ".join(results), "tool_calls": [], "steps": steps}
 
 def agent_route(state: AgentState):
     if state.final_answer:
         return "end"
-    elif state.tool_name:
+    elif state.tool_calls:
         return "execute"
     return "end"
 
 def create_agent_graph():
+    from langgraph.graph import StateGraph, START, END
     builder = StateGraph(AgentState)
     builder.add_node("reason", agent_reason)
     builder.add_node("execute", agent_execute)
@@ -269,6 +523,28 @@ def create_agent_graph():
     builder.add_edge("execute", "reason")
     return builder.compile()
 
+# ============================================================
+# Compiled graphs
+# ============================================================
+
+GRAPH_BUILDERS = {
+    "simple": create_simple_graph,
+    "llm": create_llm_graph,
+    "chat": create_chat_graph,
+    "persistent": create_persistent_graph,
+    "agent": create_agent_graph,
+}
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+def get_graph(name: str):
+    """Return a compiled example graph, building it on first use."""
+    with _graphs_lock:
+        if name not in _graphs:
+            _graphs[name] = GRAPH_BUILDERS[name]()
+    return _graphs[name]
+
 # ============================================================
 # HTML Template
 # ============================================================
@@ -437,13 +713,37 @@ HTML = '''
         
         async function runLLM() {
             const input = document.getElementById('input-b').value;
+            const result = document.getElementById('result-b');
             document.getElementById('loading').style.display = 'inline';
-            const res = await fetch('/api/llm', {
+            const res = await fetch('/api/llm_stream', {
                 method: 'POST', headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({input})
             });
-            const data = await res.json();
+            // Show the reply as it streams in; the last frame carries the parsed result
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '', text = '', data = null;
+            result.style.display = 'block';
+            while (!data) {
+                const {value, done} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                const frames = buffer.split('\\n\\n');
+                buffer = frames.pop();
+                for (const frame of frames) {
+                    const msg = JSON.parse(frame.slice(6));
+                    if (msg.done) { data = msg; break; }
+                    text += msg.delta;
+                    const sentiment = text.match(/"sentiment"\\s*:\\s*"(\\w+)"/);
+                    result.innerHTML = (sentiment ? `<p><strong>Sentiment:</strong> ${sentiment[1]}</p>` : '') + `<pre>${text}</pre>`;
+                }
+            }
             document.getElementById('loading').style.display = 'none';
+            if (!data) return;
+            if (data.error) {
+                result.innerHTML = `<p><strong>Error:</strong> ${data.error}</p>`;
+                return;
+            }
             document.getElementById('result-b').innerHTML = `
                 <div class="metrics">
                     <div class="metric"><div class="metric-value">${data.sentiment}</div><div class="metric-label">Sentiment</div></div>
@@ -520,33 +820,87 @@ HTML = '''
 </html>
 '''
 
+# The page only depends on the Ollama status, so compile the template once
+# and render both variants up front
+_HTML_TEMPLATE = app.jinja_env.from_string(HTML)
+INDEX_PAGES = {status: _HTML_TEMPLATE.render(ollama_status=status) for status in (True, False)}
+
 # ============================================================
 # Routes
 # ============================================================
 
 @app.route('/')
 def index():
-    return render_template_string(HTML, ollama_status=check_ollama())
+    return INDEX_PAGES[check_ollama()]
 
 @app.route('/api/simple', methods=['POST'])
 def api_simple():
     data = request.json
-    graph = create_simple_graph()
-    result = graph.invoke({"user_input": data['input']})
+    result = get_graph("simple").invoke({"user_input": data['input']})
     return jsonify(result)
 
+@app.route('/api/simple_batch', methods=['POST'])
+def api_simple_batch():
+    # Bulk scoring skips the per-text graph run and calls the scorer directly
+    data = request.json
+    results = []
+    for text in data.get('inputs', []):
+        sentiment, word_count = score_sentiment(text)
+        results.append({"sentiment": sentiment, "word_count": word_count})
+    return jsonify({"results": results})
+
 @app.route('/api/llm', methods=['POST'])
 def api_llm():
     data = request.json
-    graph = create_llm_graph()
-    result = graph.invoke({"user_input": data['input']})
+    result = get_graph("llm").invoke({"user_input": data['input']})
     return jsonify(result)
 
+@app.route('/api/llm_stream', methods=['POST'])
+def api_llm_stream():
+    # Same analysis as /api/llm, but as Server-Sent Events: one {"delta": ...}
+    # frame per token, then a final {"done": true, ...} frame with the parsed
+    # result. A cached result is sent as the done frame alone; a failure is
+    # reported as {"done": true, "error": ...} since the 200 is already sent.
+    user_input = request.json['input']
+    text = user_input.strip()
+    
+    def done_frame(sentiment, confidence, reasoning):
+        result = {"done": True, "user_input": user_input, "sentiment": sentiment,
+                  "confidence": confidence, "reasoning": reasoning}
+        return b"data: " + orjson.dumps(result) + b"\n\n"
+    
+    def generate():
+        hit = cached_sentiment(text, OLLAMA_MODEL, LLM_SENTIMENT_PROMPT)
+        if hit:
+            yield done_frame(*hit)
+            return
+        try:
+            stream = get_client().chat.completions.create(
+                model=OLLAMA_MODEL, temperature=0, stream=True,
+                messages=[
+                    {"role": "system", "content": LLM_SENTIMENT_PROMPT},
+                    {"role": "user", "content": text}
+                ]
+            )
+            parts = []
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield b"data: " + orjson.dumps({"delta": delta}) + b"\n\n"
+        except Exception as e:
+            yield b"data: " + orjson.dumps({"done": True, "error": str(e)}) + b"\n\n"
+            return
+        yield done_frame(*remember_sentiment(text, OLLAMA_MODEL, LLM_SENTIMENT_PROMPT,
+                                             sentiment_from_reply("".join(parts))))
+    
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     data = request.json
-    graph = create_chat_graph()
-    result = graph.invoke({"messages": data.get('messages', []), "current_input": data['input']})
+    result = get_graph("chat").invoke({"messages": data.get('messages', []), "current_input": data['input']})
     return jsonify(result)
 
 @app.route('/api/persistent', methods=['POST'])
@@ -559,7 +913,7 @@ def api_persistent():
     messages = session['threads'].get(thread_id, [])
     
     config = {"configurable": {"thread_id": thread_id}}
-    result = persistent_graph.invoke({"messages": messages, "current_input": data['input']}, config=config)
+    result = get_graph("persistent").invoke({"messages": messages, "current_input": data['input']}, config=config)
     
     session['threads'][thread_id] = result['messages']
     session.modified = True
@@ -569,8 +923,8 @@ def api_persistent():
 @app.route('/api/agent', methods=['POST'])
 def api_agent():
     data = request.json
-    graph = create_agent_graph()
-    result = graph.invoke({"query": data['query']})
+    # The agent nodes are async, so run the graph on an event loop
+    result = asyncio.run(get_graph("agent").ainvoke({"query": data['query']}))
     return jsonify({"steps": result.get('steps', []), "answer": result.get('final_answer', '')})
 
 if __name__ == '__main__':
@@ -579,7 +933,10 @@ if __name__ == '__main__':
     print("=" * 50)
     print(f"Ollama: {'Connected' if check_ollama() else 'Not running'}")
     print(f"Model: {OLLAMA_MODEL}")
+    if not os.environ.get("OLLAMA_NUM_PARALLEL"):
+        print("Tip: start 'ollama serve' with OLLAMA_NUM_PARALLEL=4 to serve requests concurrently")
     print("-" * 50)
     print("Open http://localhost:8080 in your browser")
+    print("For concurrent users: gunicorn -w 4 -k gthread --threads 8 --timeout 120 wsgi:app")
     print("=" * 50)
-    app.run(debug=True, host='127.0.0.1', port=8080)
+    app.run(host='127.0.0.1', port=8080, threaded=True)
@@ -24,8 +24,16 @@ import warnings
 # Suppress Pydantic V1 deprecation warnings for Python 3.14+
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*")
 
+import operator
+import os
+import socket
 import sys
-from typing import Literal
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Annotated, Literal
+from urllib.parse import urlsplit
+import httpx
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 
@@ -39,21 +47,37 @@ from openai import OpenAI
 OLLAMA_BASE_URL = "http://localhost:11434/v1"
 OLLAMA_MODEL = "llama3.2:1b"
 
+# While waiting for the user to type, ping Ollama this often (seconds) so it
+# keeps the model in RAM instead of unloading it after its idle timeout
+KEEPALIVE_INTERVAL = 60
+OLLAMA_KEEP_ALIVE = "10m"
+
+# Typing any of these ends the chat
+EXIT_WORDS = frozenset({"bye", "exit", "quit", "goodbye"})
+_MAX_EXIT_WORD_LEN = max(len(word) for word in EXIT_WORDS)
+
+
+# Set CHAT_VERBOSE=0 to silence progress logging
+VERBOSE = os.environ.get("CHAT_VERBOSE", "1") != "0"
+
 
 def log(message: str):
     """Print with immediate flush for progress visibility."""
-    print(message)
-    sys.stdout.flush()
+    if VERBOSE:
+        print(message, flush=True)
 
 
 # ============================================================
 # Step 1: Define State with Conversation History
 # ============================================================
 
-class Message(BaseModel):
+# A plain slotted dataclass: long histories hold many of these, and it is
+# several times smaller than a BaseModel instance
+@dataclass(slots=True, frozen=True)
+class Message:
     """A single message in the conversation."""
-    role: Literal["user", "assistant"] = Field(description="Who sent the message")
-    content: str = Field(description="The message content")
+    role: Literal["user", "assistant"]  # Who sent the message
+    content: str  # The message content
 
 
 class ChatState(BaseModel):
@@ -61,9 +85,10 @@ class ChatState(BaseModel):
     State for multi-turn conversation.
     
     Key difference from previous examples: we maintain a LIST of messages
-    to track the full conversation history.
+    to track the full conversation history. The operator.add reducer means
+    nodes return only NEW messages and LangGraph appends them.
     """
-    messages: list[Message] = Field(default_factory=list, description="Conversation history")
+    messages: Annotated[list[Message], operator.add] = Field(default_factory=list, description="Conversation history")
     current_input: str = Field(default="", description="Current user input")
     should_continue: bool = Field(default=True, description="Whether to continue the loop")
     turn_count: int = Field(default=0, description="Number of conversation turns")
@@ -73,34 +98,94 @@ class ChatState(BaseModel):
 # Step 2: Create Ollama Client
 # ============================================================
 
+_client = OpenAI(
+    base_url=OLLAMA_BASE_URL,
+    api_key="ollama"
+)
+
+
 def get_client() -> OpenAI:
-    """Get OpenAI-compatible client for Ollama."""
-    return OpenAI(
-        base_url=OLLAMA_BASE_URL,
-        api_key="ollama"
-    )
+    """Get the shared OpenAI-compatible client for Ollama."""
+    return _client
+
+
+def _keepalive_loop(stop: threading.Event):
+    """Ask Ollama to keep the model loaded until stop is set."""
+    # A generate request with no prompt just (re)loads the model and resets
+    # its keep_alive timer; no tokens are generated
+    url = OLLAMA_BASE_URL.removesuffix("/v1") + "/api/generate"
+    payload = {"model": OLLAMA_MODEL, "keep_alive": OLLAMA_KEEP_ALIVE}
+    while not stop.wait(KEEPALIVE_INTERVAL):
+        try:
+            httpx.post(url, json=payload, timeout=5)
+        except httpx.HTTPError:
+            pass
+
+
+def start_keepalive() -> threading.Event:
+    """Start the keepalive thread; set the returned event to stop it."""
+    stop = threading.Event()
+    threading.Thread(target=_keepalive_loop, args=(stop,), daemon=True).start()
+    return stop
+
+
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a helpful, friendly assistant. Keep responses concise (1-2 sentences)."}
 
+# OpenAI-format copies of each conversation, so a new turn only converts
+# the messages added since the last call
+_openai_histories: dict[str, list[dict]] = {}
 
-def chat_with_llm(messages: list[Message]) -> str:
+
+def _same_message(converted: dict, message: Message) -> bool:
+    return converted["role"] == message.role and converted["content"] == message.content
+
+
+def to_openai_messages(messages: list[Message], key: str = "default") -> list[dict]:
+    """System prompt + history in OpenAI format, reusing earlier conversions."""
+    cached = _openai_histories.get(key)
+    done = len(cached) - 1 if cached else 0
+    # Start over if the history isn't an extension of what we converted:
+    # the first and the last converted message must both still match
+    if cached is None or done > len(messages) or done and not (
+        _same_message(cached[1], messages[0]) and _same_message(cached[done], messages[done - 1])
+    ):
+        cached = [SYSTEM_MESSAGE]
+        done = 0
+    cached.extend({"role": m.role, "content": m.content} for m in messages[done:])
+    _openai_histories[key] = cached
+    return cached
+
+
+def chat_with_llm(messages: list[Message], prefix: str = "Assistant: ") -> str:
     """
     Send conversation history to LLM and get response.
     The LLM sees the full conversation context!
+    
+    The reply is streamed: tokens are printed after `prefix` as they arrive,
+    and the full text is returned at the end.
     """
     client = get_client()
     
     # Convert our Message objects to OpenAI format
-    openai_messages = [
-        {"role": "system", "content": "You are a helpful, friendly assistant. Keep responses concise (1-2 sentences)."},
-        *[{"role": m.role, "content": m.content} for m in messages]
-    ]
+    openai_messages = to_openai_messages(messages)
     
-    response = client.chat.completions.create(
+    stream = client.chat.completions.create(
         model=OLLAMA_MODEL,
         temperature=0.7,
         messages=openai_messages,
+        stream=True,
     )
     
-    return response.choices[0].message.content
+    print(prefix, end="", flush=True)
+    parts = []
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            print(delta, end="", flush=True)
+    print(flush=True)
+    
+    return "".join(parts)
 
 
 # ============================================================
@@ -130,22 +215,28 @@ def get_user_input(state: ChatState) -> dict:
     }
 
 
+def is_exit_command(text: str) -> bool:
+    """True if the user typed an exit word (case and surrounding spaces ignored)."""
+    # strip() hands back the same string when there's nothing to trim, and the
+    # length check skips lower() for anything longer than an exit word
+    text = text.strip()
+    return len(text) <= _MAX_EXIT_WORD_LEN and text.lower() in EXIT_WORDS
+
+
 def process_message(state: ChatState) -> dict:
     """
     Node 2: Add user message to history.
     """
     # Check for exit commands
-    exit_words = {"bye", "exit", "quit", "goodbye"}
-    if state.current_input.lower().strip() in exit_words:
+    if is_exit_command(state.current_input):
         log("[System] Exit command detected")
         return {"should_continue": False}
     
-    # Add user message to history
+    # Add user message to history (the reducer appends it)
     new_message = Message(role="user", content=state.current_input)
-    updated_messages = state.messages + [new_message]
     
     return {
-        "messages": updated_messages,
+        "messages": [new_message],
         "should_continue": True
     }
 
@@ -162,16 +253,13 @@ def generate_response(state: ChatState) -> dict:
     
     log(f"[LLM] Thinking...")
     
-    # Get response from LLM with full history
+    # Get response from LLM with full history (printed as it streams)
     response_text = chat_with_llm(state.messages)
     
     # Add assistant message to history
     assistant_message = Message(role="assistant", content=response_text)
-    updated_messages = state.messages + [assistant_message]
-    
-    log(f"Assistant: {response_text}")
     
-    return {"messages": updated_messages}
+    return {"messages": [assistant_message]}
 
 
 # ============================================================
@@ -230,13 +318,15 @@ def create_chat_workflow():
 # Step 6: Run Interactive Chat
 # ============================================================
 
+@lru_cache(maxsize=1)
 def check_ollama() -> bool:
-    """Check if Ollama is running."""
+    """Check if Ollama is running (cached)."""
+    # Opening a TCP connection to Ollama's port is enough to know it's up
+    url = urlsplit(OLLAMA_BASE_URL)
     try:
-        client = get_client()
-        client.models.list()
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
         return True
-    except Exception:
+    except OSError:
         return False
 
 
@@ -263,6 +353,9 @@ def main():
     # Start with empty state
     initial_state = ChatState()
     
+    # Keep the model warm while the user is thinking
+    keepalive = start_keepalive()
+    
     # Run the graph - it will loop until user says bye
     try:
         final_state = workflow.invoke(initial_state)
@@ -274,6 +367,8 @@ def main():
         
     except KeyboardInterrupt:
         log("\n\nChat interrupted by user.")
+    finally:
+        keepalive.set()
 
 
 def demo_mode():
@@ -310,14 +405,13 @@ def demo_mode():
         state.messages.append(Message(role="user", content=user_input))
         
         # Check for exit
-        if user_input.lower() in {"bye", "exit", "quit"}:
+        if is_exit_command(user_input):
             log("[System] Exit command - ending chat")
             break
         
         # Get LLM response
         log("[LLM] Thinking...")
         response = chat_with_llm(state.messages)
-        log(f"Assistant: {response}")
         
         # Add assistant message
         state.messages.append(Message(role="assistant", content=response))
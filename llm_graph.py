@@ -19,20 +19,31 @@ import warnings
 # Suppress Pydantic V1 deprecation warnings for Python 3.14+
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*")
 
-import json
-import sys
+import asyncio
+import hashlib
+import os
+import socket
+from functools import lru_cache
 from typing import Literal
-from pydantic import BaseModel, Field
+from urllib.parse import urlsplit
+import httpx
+from pydantic import BaseModel, Field, ValidationError
 from langgraph.graph import StateGraph, START, END
+from langgraph.cache.memory import InMemoryCache
+from langgraph.types import CachePolicy
 
 # OpenAI SDK works with Ollama's OpenAI-compatible API
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+
+# Set CHAT_VERBOSE=0 to silence progress logging
+VERBOSE = os.environ.get("CHAT_VERBOSE", "1") != "0"
 
 
 def log(message: str):
     """Print with immediate flush for progress visibility."""
-    print(message)
-    sys.stdout.flush()
+    if VERBOSE:
+        print(message, flush=True)
 
 
 # ============================================================
@@ -50,6 +61,9 @@ OLLAMA_BASE_URL = "http://localhost:11434/v1"
 #   - phi3 (3.8B, good for reasoning)
 OLLAMA_MODEL = "llama3.2:1b"
 
+# How long a cached sentiment result for the same text stays valid (seconds)
+SENTIMENT_CACHE_TTL = 3600
+
 
 # ============================================================
 # Step 1: Define State and LLM Response Models with Pydantic
@@ -87,21 +101,35 @@ class WorkflowState(BaseModel):
 # Step 2: Create Ollama Client (OpenAI-compatible)
 # ============================================================
 
-def get_client() -> OpenAI:
+@lru_cache(maxsize=1)
+def get_client() -> AsyncOpenAI:
     """
-    Get OpenAI-compatible client pointing to Ollama.
+    Get the shared OpenAI-compatible async client pointing to Ollama.
     No API key needed for local Ollama!
+    
+    One client keeps its connections to Ollama open between calls. They
+    belong to the event loop that opened them, so use it from one asyncio.run().
     """
-    return OpenAI(
+    return AsyncOpenAI(
         base_url=OLLAMA_BASE_URL,
-        api_key="ollama"  # Ollama doesn't need a real key, but the SDK requires something
+        api_key="ollama",  # Ollama doesn't need a real key, but the SDK requires something
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=32, max_connections=64))
     )
 
 
-def analyze_sentiment_with_llm(text: str) -> SentimentAnalysis:
+# Same system message for every request, so it is built once
+SENTIMENT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": """Classify the sentiment of the text. Respond with a JSON object:
+{"sentiment": "positive" | "negative" | "neutral", "confidence": 0.0-1.0, "reasoning": "brief explanation"}"""
+}
+
+
+async def analyze_sentiment_with_llm(text: str) -> SentimentAnalysis:
     """
     Call Ollama API with structured output using Pydantic.
-    Uses JSON mode for reliable parsing.
+    JSON mode (response_format) makes the model emit a bare JSON object,
+    which Pydantic validates straight from the string.
     """
     log(f"        [Connecting to Ollama at {OLLAMA_BASE_URL}...]")
     client = get_client()
@@ -109,46 +137,25 @@ def analyze_sentiment_with_llm(text: str) -> SentimentAnalysis:
     log(f"        [Sending request to {OLLAMA_MODEL}...]")
     log(f"        [Waiting for response (first run loads model into RAM)...]")
     
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=OLLAMA_MODEL,
         temperature=0.0,
         messages=[
-            {
-                "role": "system",
-                "content": """You are a sentiment analysis expert. Analyze the sentiment 
-of the given text and classify it as positive, negative, or neutral.
-
-You MUST respond with ONLY a valid JSON object (no other text) containing exactly these fields:
-- "sentiment": must be exactly one of "positive", "negative", or "neutral"
-- "confidence": a number between 0 and 1 (e.g., 0.85)
-- "reasoning": brief explanation for your classification
-
-Example response:
-{"sentiment": "positive", "confidence": 0.9, "reasoning": "The text expresses joy and enthusiasm"}"""
-            },
-            {
-                "role": "user",
-                "content": f"Analyze the sentiment of this text: {text}"
-            }
+            SENTIMENT_SYSTEM_MESSAGE,
+            {"role": "user", "content": f"Analyze the sentiment of this text: {text}"}
         ],
-        # Note: Ollama supports format: "json" but through OpenAI API we use response_format
+        # Ollama's JSON mode: output is constrained to a valid JSON object
+        response_format={"type": "json_object"},
     )
     
-    content = response.choices[0].message.content.strip()
+    content = (response.choices[0].message.content or "").strip()
     
     log(f"        [Response received! Parsing...]")
     
-    # Try to extract JSON from response (some models wrap it in markdown)
-    if "```json" in content:
-        content = content.split("```json")[1].split("```")[0].strip()
-    elif "```" in content:
-        content = content.split("```")[1].split("```")[0].strip()
-    
     # Parse the JSON response into our Pydantic model
     try:
-        result_json = json.loads(content)
-        return SentimentAnalysis(**result_json)
-    except (json.JSONDecodeError, Exception) as e:
+        return SentimentAnalysis.model_validate_json(content)
+    except ValidationError:
         # Fallback if parsing fails
         log(f"[Warning] Could not parse LLM response: {content}")
         return SentimentAnalysis(
@@ -158,6 +165,17 @@ Example response:
         )
 
 
+async def analyze_sentiments_batch(texts: list[str]) -> dict[str, SentimentAnalysis]:
+    """
+    Analyze several texts with one round of concurrent requests.
+    Ollama batches requests that arrive together, so this costs about as
+    much as a single call. Returns results keyed by text (duplicates run once).
+    """
+    unique = list(dict.fromkeys(texts))
+    results = await asyncio.gather(*(analyze_sentiment_with_llm(text) for text in unique))
+    return dict(zip(unique, results))
+
+
 # ============================================================
 # Step 3: Define Node Functions
 # ============================================================
@@ -176,16 +194,22 @@ def process_input(state: WorkflowState) -> dict:
     }
 
 
-def analyze_sentiment_llm(state: WorkflowState) -> dict:
+async def analyze_sentiment_llm(state: WorkflowState) -> dict:
     """
     Node 2: Use Ollama LLM for sentiment analysis.
     
     This is the key difference from simple_graph.py - we use an actual
     local LLM with structured output instead of keyword matching.
+    
+    If the state already carries a result (see run_all), it is used as-is.
     """
+    if state.reasoning:
+        log(f"[LLM] Using batched result: {state.sentiment} (confidence: {state.confidence:.0%})")
+        return {}
+    
     log(f"[LLM] Analyzing sentiment with {OLLAMA_MODEL}...")
     
-    result = analyze_sentiment_with_llm(state.processed_input)
+    result = await analyze_sentiment_with_llm(state.processed_input)
     
     log(f"[LLM] Result: {result.sentiment} (confidence: {result.confidence:.0%})")
     log(f"[LLM] Reasoning: {result.reasoning}")
@@ -197,50 +221,49 @@ def analyze_sentiment_llm(state: WorkflowState) -> dict:
     }
 
 
-def generate_positive_response(state: WorkflowState) -> dict:
-    """Node 3a: Generate response for positive sentiment."""
-    response = (
-        f"I can feel the positivity! ({state.confidence:.0%} confident) "
-        f"Your {state.word_count} words radiate good vibes. "
-        f"Analysis: {state.reasoning}"
-    )
-    log("[Response] Generating positive response")
-    return {"response": response}
-
-
-def generate_negative_response(state: WorkflowState) -> dict:
-    """Node 3b: Generate response for negative sentiment."""
-    response = (
-        f"I sense some difficult emotions here. ({state.confidence:.0%} confident) "
-        f"It's okay to feel this way. "
-        f"Analysis: {state.reasoning}"
-    )
-    log("[Response] Generating supportive response")
-    return {"response": response}
-
-
-def generate_neutral_response(state: WorkflowState) -> dict:
-    """Node 3c: Generate response for neutral sentiment."""
-    response = (
-        f"Thanks for sharing those {state.word_count} words. ({state.confidence:.0%} confident) "
-        f"Analysis: {state.reasoning}"
-    )
-    log("[Response] Generating neutral response")
-    return {"response": response}
+# Reply template and log label for each sentiment
+RESPONSE_TEMPLATES = {
+    "positive": (
+        "I can feel the positivity! ({conf:.0%} confident) "
+        "Your {words} words radiate good vibes. "
+        "Analysis: {reasoning}",
+        "positive",
+    ),
+    "negative": (
+        "I sense some difficult emotions here. ({conf:.0%} confident) "
+        "It's okay to feel this way. "
+        "Analysis: {reasoning}",
+        "supportive",
+    ),
+    "neutral": (
+        "Thanks for sharing those {words} words. ({conf:.0%} confident) "
+        "Analysis: {reasoning}",
+        "neutral",
+    ),
+}
+
+
+def generate_response(state: WorkflowState) -> dict:
+    """Node 3: Fill in the response template for the detected sentiment."""
+    template, label = RESPONSE_TEMPLATES[state.sentiment]
+    log(f"[Response] Generating {label} response")
+    return {"response": template.format(
+        conf=state.confidence, words=state.word_count, reasoning=state.reasoning
+    )}
 
 
 # ============================================================
-# Step 4: Define Routing Logic
+# Step 4: Build the Graph
 # ============================================================
 
-def route_by_sentiment(state: WorkflowState) -> Literal["positive", "negative", "neutral"]:
-    """Route based on LLM-detected sentiment."""
-    return state.sentiment
-
+def sentiment_cache_key(state: WorkflowState) -> bytes:
+    """
+    Cache key for the LLM node: the text it analyzes, plus any result
+    already filled in by run_all (so those runs don't share entries with
+    real LLM calls).
+    """
+    return hashlib.blake2b(f"{state.processed_input}\0{state.reasoning}".encode()).digest()
 
-# ============================================================
-# Step 5: Build the Graph
-# ============================================================
 
 def create_workflow() -> StateGraph:
     """Build and compile the LLM-powered workflow."""
@@ -249,49 +272,61 @@ def create_workflow() -> StateGraph:
     
     # Add nodes
     builder.add_node("process_input", process_input)
-    builder.add_node("analyze_sentiment", analyze_sentiment_llm)  # Ollama-powered!
-    builder.add_node("positive", generate_positive_response)
-    builder.add_node("negative", generate_negative_response)
-    builder.add_node("neutral", generate_neutral_response)
+    # Ollama-powered! Cached, so the same text is only sent to the LLM once
+    builder.add_node(
+        "analyze_sentiment",
+        analyze_sentiment_llm,
+        cache_policy=CachePolicy(key_func=sentiment_cache_key, ttl=SENTIMENT_CACHE_TTL)
+    )
+    # One node picks the reply template, so no conditional routing is needed
+    builder.add_node("respond", generate_response)
     
     # Define flow
     builder.add_edge(START, "process_input")
     builder.add_edge("process_input", "analyze_sentiment")
+    builder.add_edge("analyze_sentiment", "respond")
+    builder.add_edge("respond", END)
     
-    # Conditional routing
-    builder.add_conditional_edges(
-        "analyze_sentiment",
-        route_by_sentiment,
-        {
-            "positive": "positive",
-            "negative": "negative",
-            "neutral": "neutral"
-        }
-    )
-    
-    # All responses lead to END
-    builder.add_edge("positive", END)
-    builder.add_edge("negative", END)
-    builder.add_edge("neutral", END)
-    
-    return builder.compile()
+    return builder.compile(cache=InMemoryCache())
 
 
 # ============================================================
-# Step 6: Run the Workflow
+# Step 5: Run the Workflow
 # ============================================================
 
+@lru_cache(maxsize=1)
 def check_ollama_running() -> bool:
-    """Check if Ollama is running and accessible."""
+    """Check if Ollama is running and accessible (cached)."""
+    # Opening a TCP connection to Ollama's port is enough to know it's up
+    url = urlsplit(OLLAMA_BASE_URL)
     try:
-        client = get_client()
-        client.models.list()
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
         return True
-    except Exception:
+    except OSError:
         return False
 
 
-def main():
+async def run_all(workflow, test_inputs: list[str]) -> list[dict]:
+    """
+    Run every input through the workflow.
+    All sentiment calls go out first as one batch (start Ollama with
+    OLLAMA_NUM_PARALLEL to let it serve them together), then each workflow
+    runs with its result already filled in.
+    """
+    analyses = await analyze_sentiments_batch([text.strip() for text in test_inputs])
+    states = []
+    for text in test_inputs:
+        analysis = analyses[text.strip()]
+        states.append(WorkflowState(
+            user_input=text,
+            sentiment=analysis.sentiment,
+            confidence=analysis.confidence,
+            reasoning=analysis.reasoning
+        ))
+    return await asyncio.gather(*(workflow.ainvoke(state) for state in states))
+
+
+async def main():
     """Run the Ollama-powered workflow with test inputs."""
     
     # Check if Ollama is running
@@ -324,15 +359,14 @@ def main():
     ]
     
     total_tests = len(test_inputs)
-    for i, user_text in enumerate(test_inputs, 1):
+    log(f"\nRunning {total_tests} tests concurrently...\n")
+    results = await run_all(workflow, test_inputs)
+    
+    for i, (user_text, result) in enumerate(zip(test_inputs, results), 1):
         log(f"\n{'-' * 60}")
         log(f"Test {i}/{total_tests}: \"{user_text}\"")
         log("-" * 60)
-        
-        initial_state = WorkflowState(user_input=user_text)
-        result = workflow.invoke(initial_state)
-        
-        log(f"\n[Final Response]: {result['response']}")
+        log(f"[Final Response]: {result['response']}")
     
     log(f"\n{'=' * 60}")
     log("All tests completed!")
@@ -340,4 +374,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
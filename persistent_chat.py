@@ -14,11 +14,24 @@ import warnings
 # Suppress Pydantic V1 deprecation warnings for Python 3.14+
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*")
 
-import sys
-from typing import Literal
+import operator
+import os
+import socket
+import sqlite3
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Annotated, Literal
+from urllib.parse import urlsplit
+import httpx
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # pip install langgraph-checkpoint-sqlite
+    SqliteSaver = None
+from langchain_core.runnables import RunnableConfig
 
 from openai import OpenAI
 
@@ -30,26 +43,39 @@ from openai import OpenAI
 OLLAMA_BASE_URL = "http://localhost:11434/v1"
 OLLAMA_MODEL = "llama3.2:1b"
 
+# Where SqliteSaver keeps checkpoints. In memory by default so every run of
+# the demo starts fresh; point it at a file (e.g. chat_state.db) to have the
+# next run resume each thread where this one stopped.
+CHECKPOINT_DB = os.environ.get("CHAT_CHECKPOINT_DB", ":memory:")
+
+
+# Set CHAT_VERBOSE=0 to silence progress logging
+VERBOSE = os.environ.get("CHAT_VERBOSE", "1") != "0"
+
 
 def log(message: str):
     """Print with immediate flush."""
-    print(message)
-    sys.stdout.flush()
+    if VERBOSE:
+        print(message, flush=True)
 
 
 # ============================================================
 # Step 1: Define State
 # ============================================================
 
-class Message(BaseModel):
+# A plain slotted dataclass: long histories hold many of these, and it is
+# several times smaller than a BaseModel instance
+@dataclass(slots=True, frozen=True)
+class Message:
     """A single message in the conversation."""
-    role: Literal["user", "assistant"] = Field(description="Who sent the message")
-    content: str = Field(description="The message content")
+    role: Literal["user", "assistant"]  # Who sent the message
+    content: str  # The message content
 
 
 class ChatState(BaseModel):
     """State for persistent conversation."""
-    messages: list[Message] = Field(default_factory=list)
+    # Nodes return only new messages; operator.add appends them to the history
+    messages: Annotated[list[Message], operator.add] = Field(default_factory=list)
     current_input: str = Field(default="")
     turn_count: int = Field(default=0)
 
@@ -58,26 +84,66 @@ class ChatState(BaseModel):
 # Step 2: Ollama Client
 # ============================================================
 
+@lru_cache(maxsize=1)
 def get_client() -> OpenAI:
-    return OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+    # One client for the whole demo so every turn reuses the same connection
+    return OpenAI(
+        base_url=OLLAMA_BASE_URL,
+        api_key="ollama",
+        http_client=httpx.Client(limits=httpx.Limits(max_keepalive_connections=32, max_connections=64))
+    )
+
+
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a helpful assistant. Keep responses concise (1-2 sentences). Remember details the user shares."}
+
+# OpenAI-format copies of each conversation, so a new turn only converts
+# the messages added since the last call
+_openai_histories: dict[str, list[dict]] = {}
+
+
+def _same_message(converted: dict, message: Message) -> bool:
+    return converted["role"] == message.role and converted["content"] == message.content
 
 
-def chat_with_llm(messages: list[Message]) -> str:
-    """Send conversation to LLM."""
+def to_openai_messages(messages: list[Message], key: str = "default") -> list[dict]:
+    """System prompt + history in OpenAI format, reusing earlier conversions."""
+    cached = _openai_histories.get(key)
+    done = len(cached) - 1 if cached else 0
+    # Start over if the history isn't an extension of what we converted:
+    # the first and the last converted message must both still match
+    if cached is None or done > len(messages) or done and not (
+        _same_message(cached[1], messages[0]) and _same_message(cached[done], messages[done - 1])
+    ):
+        cached = [SYSTEM_MESSAGE]
+        done = 0
+    cached.extend({"role": m.role, "content": m.content} for m in messages[done:])
+    _openai_histories[key] = cached
+    return cached
+
+
+def chat_with_llm(messages: list[Message], thread_id: str = "default", prefix: str = "[Assistant] ") -> str:
+    """Send conversation to LLM, printing the reply as it streams in."""
     client = get_client()
     
-    openai_messages = [
-        {"role": "system", "content": "You are a helpful assistant. Keep responses concise (1-2 sentences). Remember details the user shares."},
-        *[{"role": m.role, "content": m.content} for m in messages]
-    ]
+    openai_messages = to_openai_messages(messages, key=thread_id)
     
-    response = client.chat.completions.create(
+    stream = client.chat.completions.create(
         model=OLLAMA_MODEL,
         temperature=0.7,
         messages=openai_messages,
+        stream=True,
     )
     
-    return response.choices[0].message.content
+    print(prefix, end="", flush=True)
+    parts = []
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            print(delta, end="", flush=True)
+    print(flush=True)
+    
+    return "".join(parts)
 
 
 # ============================================================
@@ -89,32 +155,48 @@ def process_input(state: ChatState) -> dict:
     log(f"[Processing] Adding message to history...")
     
     new_message = Message(role="user", content=state.current_input)
-    updated_messages = state.messages + [new_message]
     
     return {
-        "messages": updated_messages,
+        "messages": [new_message],
         "turn_count": state.turn_count + 1
     }
 
 
-def generate_response(state: ChatState) -> dict:
+def generate_response(state: ChatState, config: RunnableConfig) -> dict:
     """Generate LLM response."""
     log(f"[LLM] Generating response (turn {state.turn_count})...")
     
-    response_text = chat_with_llm(state.messages)
+    thread_id = config["configurable"]["thread_id"]
+    response_text = chat_with_llm(state.messages, thread_id)  # printed as it streams
     
     assistant_message = Message(role="assistant", content=response_text)
-    updated_messages = state.messages + [assistant_message]
     
-    log(f"[Assistant] {response_text}")
-    
-    return {"messages": updated_messages}
+    return {"messages": [assistant_message]}
 
 
 # ============================================================
 # Step 4: Build Graph WITH Checkpointer
 # ============================================================
 
+def create_checkpointer(path: str = CHECKPOINT_DB):
+    """
+    SqliteSaver on a WAL-mode database, or MemorySaver if the sqlite
+    checkpointer isn't installed.
+    
+    SqliteSaver writes each checkpoint as an indexed row instead of
+    keeping every snapshot in an in-RAM dict, and WAL lets writes
+    proceed without blocking readers of other threads.
+    """
+    if SqliteSaver is None:
+        return MemorySaver()
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # Let checkpoints saved by an earlier run load Message back without a warning
+    serde = JsonPlusSerializer(allowed_msgpack_modules=[(Message.__module__, "Message")])
+    return SqliteSaver(conn, serde=serde)
+
+
 def create_persistent_chat():
     """
     Create a chat workflow with memory persistence.
@@ -134,8 +216,7 @@ def create_persistent_chat():
     builder.add_edge("respond", END)
     
     # Create checkpointer - this is what enables persistence!
-    # MemorySaver stores in RAM (use SqliteSaver for disk persistence)
-    checkpointer = MemorySaver()
+    checkpointer = create_checkpointer()
     
     # Compile WITH the checkpointer
     return builder.compile(checkpointer=checkpointer)
@@ -145,11 +226,15 @@ def create_persistent_chat():
 # Step 5: Demo - Show Persistence Across "Sessions"
 # ============================================================
 
+@lru_cache(maxsize=1)
 def check_ollama() -> bool:
+    """Check if Ollama is running (cached)."""
+    # Opening a TCP connection to Ollama's port is enough to know it's up
+    url = urlsplit(OLLAMA_BASE_URL)
     try:
-        get_client().models.list()
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
         return True
-    except:
+    except OSError:
         return False
 
 
@@ -246,8 +331,8 @@ def main():
 Key Takeaways:
 1. Each thread_id maintains SEPARATE conversation history
 2. Returning to a thread_id resumes where you left off
-3. The checkpointer (MemorySaver) stores state automatically
-4. For production, use SqliteSaver or PostgresSaver for disk storage
+3. The checkpointer (SqliteSaver) stores state automatically
+4. For multi-process production use, try PostgresSaver
 """)
 
 
@@ -8,7 +8,8 @@ review between key steps.
 
 Pipeline Flow:
 --------------
-START → step1_load_source → step2_load_template → step3_analyze_mapping 
+START ┬→ step1_load_source   ┬→ step3_analyze_mapping 
+      └→ step2_load_template ┘
       → [HUMAN REVIEW] → step4_transform → step5_validate 
       → [HUMAN APPROVAL] → step6_generate_output → END
 
@@ -22,50 +23,58 @@ import warnings
 # Suppress Pydantic V1 deprecation warnings for Python 3.14+
 warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*")
 
-import json
+import asyncio
+import atexit
+import hashlib
+import io
+import logging
+import operator
+import orjson
 import os
 import platform
-import struct
+import queue
+import re
+import sys
 import uuid
+import weakref
 from datetime import datetime
-from typing import Literal, Optional
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Annotated, Literal, Optional
+import httpx
+from pydantic import BaseModel, Field, ValidationError
 from langgraph.graph import StateGraph, START, END
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # ============================================================
 # Platform Detection
 # ============================================================
 
+@lru_cache(maxsize=1)
 def detect_platform():
     """
     Detect the current platform environment.
     Returns dict with OS, architecture, and system info.
+    
+    OS flags come from sys.platform and the rest from platform.uname(), both
+    cheap. platform.processor() can shell out to `uname -p`, so the processor
+    name is only looked up when NEED_PROCESSOR_NAME is set.
     """
+    uname = platform.uname()
     info = {
-        "os": platform.system(),  # Windows, Linux, Darwin (macOS)
-        "os_release": platform.release(),
-        "os_version": platform.version(),
-        "architecture": platform.machine(),  # AMD64, x86_64, ARM64, aarch64
-        "processor": platform.processor(),
+        "os": uname.system,  # Windows, Linux, Darwin (macOS)
+        "os_release": uname.release,
+        "os_version": uname.version,
+        "architecture": uname.machine,  # AMD64, x86_64, ARM64, aarch64
+        "processor": platform.processor() if os.environ.get("NEED_PROCESSOR_NAME") else "",
         "python_version": platform.python_version(),
-        "bits": struct.calcsize("P") * 8,
-        "is_arm": False,
-        "is_windows": False,
-        "is_linux": False,
-        "is_macos": False
+        "bits": 64 if sys.maxsize > 2**32 else 32,
+        "is_arm": any(arm in uname.machine.lower() for arm in ("arm", "aarch")),
+        "is_windows": sys.platform == "win32",
+        "is_linux": sys.platform.startswith("linux"),
+        "is_macos": sys.platform == "darwin"
     }
     
-    # Detect ARM architecture
-    arch_lower = info["architecture"].lower()
-    info["is_arm"] = any(arm in arch_lower for arm in ["arm", "aarch"])
-    
-    # Detect OS type
-    os_name = info["os"].lower()
-    info["is_windows"] = os_name == "windows"
-    info["is_linux"] = os_name == "linux"
-    info["is_macos"] = os_name == "darwin"
-    
     # Build summary string
     os_str = "Windows" if info["is_windows"] else "Linux" if info["is_linux"] else "macOS" if info["is_macos"] else info["os"]
     arch_str = "ARM64" if info["is_arm"] else info["architecture"]
@@ -80,9 +89,10 @@ def generate_run_id():
     """Generate a unique run ID (short UUID)."""
     return str(uuid.uuid4())[:8]
 
-def generate_output_filename(run_id: str, base_name: str = "transformed_ieee830") -> str:
-    """Generate unique output filename with timestamp and GUID."""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def generate_output_filename(run_id: str, base_name: str = "transformed_ieee830",
+                             now: Optional[datetime] = None) -> str:
+    """Generate unique output filename with timestamp (default: now) and GUID."""
+    timestamp = (now or datetime.now()).strftime("%Y%m%d_%H%M%S")
     return f"{base_name}_{timestamp}_{run_id}.md"
 
 # ============================================================
@@ -92,11 +102,60 @@ def generate_output_filename(run_id: str, base_name: str = "transformed_ieee830"
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434/v1")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:1b")
 
-def get_client():
-    return OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+# Sampling temperature for the mapping step. At 0 the reply is deterministic,
+# so a cached reply is exactly what a repeat call would return.
+OLLAMA_TEMPERATURE = float(os.environ.get("OLLAMA_TEMPERATURE", "0"))
+
+# Most LLM requests in flight at once across concurrent pipeline runs; the
+# rest wait their turn instead of piling up in Ollama's queue
+LLM_MAX_CONCURRENCY = 10
+# A Semaphore binds to the first loop that waits on it, so keep one per loop
+_llm_semaphores = weakref.WeakKeyDictionary()
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """The concurrency limit shared by everything on the running event loop."""
+    loop = asyncio.get_running_loop()
+    sem = _llm_semaphores.get(loop)
+    if sem is None:
+        sem = _llm_semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return sem
+
+@lru_cache(maxsize=1)
+def get_async_client():
+    # One pooled client for the whole run. Its connections belong to the
+    # event loop that opens them, so use it from one asyncio.run() (see run_pipeline)
+    return AsyncOpenAI(
+        base_url=OLLAMA_BASE_URL,
+        api_key="ollama",
+        http_client=httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=20, max_connections=100))
+    )
 
-def log(msg: str):
-    print(msg)
+async def call_llm(messages: list[dict], **kwargs) -> str:
+    """Send one chat request through the shared, concurrency-limited client."""
+    async with _llm_semaphore():
+        response = await get_async_client().chat.completions.create(
+            model=OLLAMA_MODEL,
+            messages=messages,
+            **kwargs
+        )
+    return response.choices[0].message.content
+
+# Progress output goes through logging: log() only enqueues the record and a
+# single listener thread writes it, so concurrent runs don't contend for the
+# stdout lock. Pass values as args so the message is only formatted if emitted.
+_logger = logging.getLogger(__name__)
+_logger.setLevel(logging.INFO)
+_logger.propagate = False
+_log_queue = queue.SimpleQueue()
+_logger.addHandler(QueueHandler(_log_queue))
+_console = logging.StreamHandler(sys.stdout)
+_console.setFormatter(logging.Formatter("%(message)s"))
+_log_listener = QueueListener(_log_queue, _console)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # drains whatever is still queued
+
+def log(msg: str, *args):
+    _logger.info(msg, *args)
 
 
 # ============================================================
@@ -333,6 +392,8 @@ class TransformState(BaseModel):
     
     # Transformation results
     transformed_content: dict = Field(default_factory=dict, description="Content mapped to new template")
+    fr_count: int = Field(default=0, description="Functional requirements in the transformed content")
+    nfr_count: int = Field(default=0, description="Non-functional requirements in the transformed content")
     validation_results: dict = Field(default_factory=dict, description="Validation check results")
     
     # Final output
@@ -341,8 +402,9 @@ class TransformState(BaseModel):
     
     # Metadata
     current_step: str = Field(default="", description="Current processing step")
-    errors: list[str] = Field(default_factory=list)
-    processing_log: list[str] = Field(default_factory=list)
+    # Nodes return only their new entries; operator.add appends them
+    errors: Annotated[list[str], operator.add] = Field(default_factory=list)
+    processing_log: Annotated[list[str], operator.add] = Field(default_factory=list)
     started_at: str = Field(default="", description="Pipeline start time")
 
 
@@ -350,16 +412,29 @@ class TransformState(BaseModel):
 # Step 1: Load Source Requirements Document
 # ============================================================
 
-def step1_load_source(state: TransformState) -> dict:
-    """Load and parse the source requirements document."""
-    log("\n[Step 1] Loading source requirements document...")
-    
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 1 started: {datetime.now().isoformat()}")
-    
-    # Use the generic requirements document
-    source = GENERIC_REQUIREMENTS_DOC
+# Non-blank source lines (surrounding whitespace trimmed), tagged in the
+# order step1 checks them. A heading mark with no title is plain text.
+_SOURCE_LINE_RE = re.compile(r"""
+    ^[ \t]*(?:
+        (?P<meta>(?:Version|Date|Author):(?:.*\S)?)
+      | \#[ ][ \t]*(?P<title>\S(?:.*\S)?)
+      | \#\#[ ][ \t]*(?P<section>\S(?:.*\S)?)
+      | \#\#\#[ ][ \t]*(?P<subsection>\S(?:.*\S)?)
+      | -[ ](?P<functional>FR-(?:.*\S)?)
+      | -[ ](?P<non_functional>NFR-(?:.*\S)?)
+      | (?P<text>\S(?:.*\S)?)
+    )
+""", re.MULTILINE | re.VERBOSE)
+
+
+@lru_cache(maxsize=8)
+def _parse_source(source: str) -> dict:
+    """
+    Parse a requirements document into sections and requirements.
     
+    Cached per document text, so callers share one dict and must not
+    modify it.
+    """
     # Parse into structured format
     parsed = {
         "title": "",
@@ -376,83 +451,99 @@ def step1_load_source(state: TransformState) -> dict:
     current_section = None
     current_subsection = None
     
-    for line in source.split('\n'):
-        line_stripped = line.strip()
+    # One regex pass over the document; each match is a non-blank line
+    # (surrounding whitespace trimmed) tagged by which group matched
+    for match in _SOURCE_LINE_RE.finditer(source):
+        kind = match.lastgroup
         
         # Extract metadata
-        if line_stripped.startswith('Version:'):
-            parsed["version"] = line_stripped.replace('Version:', '').strip()
-        elif line_stripped.startswith('Date:'):
-            parsed["date"] = line_stripped.replace('Date:', '').strip()
-        elif line_stripped.startswith('Author:'):
-            parsed["metadata"]["author"] = line_stripped.replace('Author:', '').strip()
+        if kind == "meta":
+            key, value = match["meta"].split(':', 1)
+            if key == "Author":
+                parsed["metadata"]["author"] = value.strip()
+            else:
+                parsed[key.lower()] = value.strip()
         
         # Main title
-        elif line_stripped.startswith('# ') and not line_stripped.startswith('## '):
-            parsed["title"] = line_stripped[2:].strip()
+        elif kind == "title":
+            parsed["title"] = match["title"]
         
         # Section headers
-        elif line_stripped.startswith('## '):
+        elif kind == "section":
             if current_section:
                 parsed["sections"].append(current_section)
             current_section = {
-                "title": line_stripped[3:].strip(),
+                "title": match["section"],
                 "subsections": [],
                 "content": []
             }
             current_subsection = None
         
         # Subsection headers
-        elif line_stripped.startswith('### '):
+        elif kind == "subsection":
             if current_section:
                 current_subsection = {
-                    "title": line_stripped[4:].strip(),
+                    "title": match["subsection"],
                     "items": []
                 }
                 current_section["subsections"].append(current_subsection)
         
-        # Requirements (FR- or NFR-)
-        elif line_stripped.startswith('- FR-') or line_stripped.startswith('- NFR-'):
-            req_text = line_stripped[2:]  # Remove "- "
-            req_parts = req_text.split(':', 1)
+        # Requirements (FR- or NFR-); the group name is the category
+        elif kind == "functional" or kind == "non_functional":
+            req_parts = match[kind].split(':', 1)
             req = {
                 "id": req_parts[0].strip(),
                 "description": req_parts[1].strip() if len(req_parts) > 1 else "",
-                "category": "functional" if "FR-" in req_parts[0] else "non_functional"
+                "category": kind
             }
             
-            if req["category"] == "functional":
-                parsed["requirements"]["functional"].append(req)
-            else:
-                parsed["requirements"]["non_functional"].append(req)
+            parsed["requirements"][kind].append(req)
             
             if current_subsection:
                 current_subsection["items"].append(req)
         
         # Regular content
-        elif line_stripped and current_subsection:
-            if line_stripped.startswith('- '):
-                current_subsection["items"].append({"text": line_stripped[2:]})
+        elif current_subsection:
+            text = match["text"]
+            if text.startswith('- '):
+                current_subsection["items"].append({"text": text[2:]})
             else:
-                current_subsection["items"].append({"text": line_stripped})
+                current_subsection["items"].append({"text": text})
     
     # Don't forget the last section
     if current_section:
         parsed["sections"].append(current_section)
     
-    log(f"    Loaded document: {parsed['title']}")
-    log(f"    Sections: {len(parsed['sections'])}")
-    log(f"    Functional requirements: {len(parsed['requirements']['functional'])}")
-    log(f"    Non-functional requirements: {len(parsed['requirements']['non_functional'])}")
+    return parsed
+
+
+def step1_load_source(state: TransformState) -> dict:
+    """Load and parse the source requirements document."""
+    log("\n[Step 1] Loading source requirements document...")
+    
+    now = datetime.now().isoformat()
+    processing_log = [f"Step 1 started: {now}"]
+    
+    # Use the generic requirements document
+    source = GENERIC_REQUIREMENTS_DOC
+    
+    # Parse into structured format (cached, parsed once per document)
+    parsed = _parse_source(source)
+    
+    log("    Loaded document: %s", parsed["title"])
+    log("    Sections: %d", len(parsed["sections"]))
+    log("    Functional requirements: %d", len(parsed["requirements"]["functional"]))
+    log("    Non-functional requirements: %d", len(parsed["requirements"]["non_functional"]))
     
     processing_log.append(f"Loaded {len(parsed['sections'])} sections")
     
     return {
         "source_document": source,
         "source_parsed": parsed,
-        "current_step": "step1_load_source",
+        # current_step is set by step2_load_template, which runs in the same
+        # super-step (a plain field takes only one write per step)
         "processing_log": processing_log,
-        "started_at": datetime.now().isoformat()
+        "started_at": now
     }
 
 
@@ -460,13 +551,24 @@ def step1_load_source(state: TransformState) -> dict:
 # Step 2: Load Target Template Structure
 # ============================================================
 
-def step2_load_template(state: TransformState) -> dict:
-    """Load and analyze the target template structure."""
-    log("\n[Step 2] Loading target template structure...")
-    
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 2 started: {datetime.now().isoformat()}")
+# Non-blank template lines, trimmed like _SOURCE_LINE_RE
+_TEMPLATE_LINE_RE = re.compile(r"""
+    ^[ \t]*(?:
+        \#\#[ ][ \t]*(?P<section>\S(?:.*\S)?)
+      | (?P<level>\#\#\#\#?)[ ][ \t]*(?P<subsection>\S(?:.*\S)?)
+      | (?P<text>\S(?:.*\S)?)
+    )
+""", re.MULTILINE | re.VERBOSE)
+
+
+@lru_cache(maxsize=8)
+def _parse_template(template: str) -> dict:
+    """
+    Parse a template into sections, subsections and placeholders.
     
+    Cached per template text, so callers share one dict and must not
+    modify it.
+    """
     # Parse template structure
     template_structure = {
         "format": "IEEE 830",
@@ -477,16 +579,16 @@ def step2_load_template(state: TransformState) -> dict:
     current_section = None
     current_subsection = None
     
-    for line in TARGET_TEMPLATE.split('\n'):
-        line_stripped = line.strip()
+    for match in _TEMPLATE_LINE_RE.finditer(template):
+        kind = match.lastgroup
         
         # Section headers
-        if line_stripped.startswith('## '):
+        if kind == "section":
             if current_section:
                 template_structure["sections"].append(current_section)
             current_section = {
                 "number": "",
-                "title": line_stripped[3:].strip(),
+                "title": match["section"],
                 "subsections": [],
                 "placeholders": []
             }
@@ -498,19 +600,18 @@ def step2_load_template(state: TransformState) -> dict:
             current_subsection = None
         
         # Subsection headers
-        elif line_stripped.startswith('### ') or line_stripped.startswith('#### '):
-            prefix_len = 4 if line_stripped.startswith('### ') else 5
+        elif kind == "subsection":
             if current_section:
                 current_subsection = {
-                    "title": line_stripped[prefix_len:].strip(),
-                    "level": 3 if prefix_len == 4 else 4,
+                    "title": match["subsection"],
+                    "level": len(match["level"]),
                     "placeholders": []
                 }
                 current_section["subsections"].append(current_subsection)
         
         # Placeholders [text in brackets]
-        elif '[' in line_stripped and ']' in line_stripped:
-            placeholder = line_stripped
+        elif '[' in match["text"] and ']' in match["text"]:
+            placeholder = match["text"]
             if current_subsection:
                 current_subsection["placeholders"].append(placeholder)
             elif current_section:
@@ -521,9 +622,21 @@ def step2_load_template(state: TransformState) -> dict:
     if current_section:
         template_structure["sections"].append(current_section)
     
-    log(f"    Template format: {template_structure['format']}")
-    log(f"    Template sections: {len(template_structure['sections'])}")
-    log(f"    Placeholders to fill: {len(template_structure['placeholders'])}")
+    return template_structure
+
+
+def step2_load_template(state: TransformState) -> dict:
+    """Load and analyze the target template structure."""
+    log("\n[Step 2] Loading target template structure...")
+    
+    processing_log = [f"Step 2 started: {datetime.now().isoformat()}"]
+    
+    # Parse template structure (cached, parsed once per template)
+    template_structure = _parse_template(TARGET_TEMPLATE)
+    
+    log("    Template format: %s", template_structure["format"])
+    log("    Template sections: %d", len(template_structure["sections"]))
+    log("    Placeholders to fill: %d", len(template_structure["placeholders"]))
     
     processing_log.append(f"Template has {len(template_structure['sections'])} sections")
     
@@ -539,35 +652,64 @@ def step2_load_template(state: TransformState) -> dict:
 # Step 3: Analyze and Propose Mapping (LLM-Assisted)
 # ============================================================
 
-def step3_analyze_mapping(state: TransformState) -> dict:
-    """Use LLM to analyze source and propose mapping to target template."""
-    log("\n[Step 3] Analyzing and proposing mapping...")
-    
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 3 started: {datetime.now().isoformat()}")
-    
-    client = get_client()
-    
-    # Build context for LLM
-    source_summary = {
-        "title": state.source_parsed.get("title"),
-        "sections": [s["title"] for s in state.source_parsed.get("sections", [])],
-        "functional_reqs": len(state.source_parsed.get("requirements", {}).get("functional", [])),
-        "nonfunctional_reqs": len(state.source_parsed.get("requirements", {}).get("non_functional", []))
+class MappingEntry(BaseModel):
+    """One source section → target section pair proposed by the LLM."""
+    source: str
+    target: str
+    notes: str = ""
+
+
+class MappingResponse(BaseModel):
+    """Shape of the LLM's mapping reply (see the prompt in step3)."""
+    mapping: list[MappingEntry]
+    unmapped_source: list[str] = []
+    target_needs_content: list[str] = []
+    transformation_notes: str = ""
+
+
+# Parsed mapping replies keyed by _mapping_key, so an identical request
+# (same model, temperature and prompt) in this process skips the LLM call
+_mapping_cache: dict[str, dict] = {}
+
+
+def _mapping_key(prompt: str) -> str:
+    """Hash of everything that determines the mapping request."""
+    return hashlib.blake2b(f"{OLLAMA_MODEL}\0{OLLAMA_TEMPERATURE}\0{prompt}".encode(), digest_size=16).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _template_summary_json(template: str) -> str:
+    """Template summary for step 3's prompt, serialized once per template."""
+    template_structure = _parse_template(template)
+    template_summary = {
+        "format": template_structure.get("format"),
+        "sections": [s["title"] for s in template_structure.get("sections", [])]
     }
+    return orjson.dumps(template_summary, option=orjson.OPT_INDENT_2).decode()
+
+
+@lru_cache(maxsize=8)
+def _mapping_prompt(source: str, template: str) -> str:
+    """
+    Step 3's prompt for a source document and target template, built once
+    per pair. The template part is shared by every source using it.
+    """
+    source_parsed = _parse_source(source)
     
-    template_summary = {
-        "format": state.template_structure.get("format"),
-        "sections": [s["title"] for s in state.template_structure.get("sections", [])]
+    source_summary = {
+        "title": source_parsed.get("title"),
+        "sections": [s["title"] for s in source_parsed.get("sections", [])],
+        "functional_reqs": len(source_parsed.get("requirements", {}).get("functional", [])),
+        "nonfunctional_reqs": len(source_parsed.get("requirements", {}).get("non_functional", []))
     }
     
-    prompt = f"""You are a requirements analyst. Map source document sections to target template.
+    return f"""You are a requirements analyst. Map source document sections to target template.
 
 SOURCE DOCUMENT STRUCTURE:
-{json.dumps(source_summary, indent=2)}
+{orjson.dumps(source_summary, option=orjson.OPT_INDENT_2).decode()}
 
 TARGET TEMPLATE (IEEE 830):
-{json.dumps(template_summary, indent=2)}
+{_template_summary_json(template)}
 
 Create a mapping showing which source sections map to which target sections.
 Respond in JSON format:
@@ -580,31 +722,45 @@ Respond in JSON format:
     "transformation_notes": "overall strategy"
 }}"""
 
-    log("    Calling LLM for mapping analysis...")
+
+async def step3_analyze_mapping(state: TransformState) -> dict:
+    """Use LLM to analyze source and propose mapping to target template."""
+    log("\n[Step 3] Analyzing and proposing mapping...")
+    
+    processing_log = [f"Step 3 started: {datetime.now().isoformat()}"]
+    
+    # Build context for LLM (built once per source/template pair)
+    prompt = _mapping_prompt(state.source_document, state.target_template)
+    
+    key = _mapping_key(prompt)
     
     try:
-        response = client.chat.completions.create(
-            model=OLLAMA_MODEL,
-            temperature=0.3,
-            messages=[
-                {"role": "system", "content": "You are a requirements engineering expert. Always respond in valid JSON."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        llm_response = response.choices[0].message.content
-        
-        # Try to parse JSON from response
-        try:
-            # Find JSON in response
-            import re
-            json_match = re.search(r'\{[\s\S]*\}', llm_response)
-            if json_match:
-                mapping = json.loads(json_match.group())
-            else:
+        if key in _mapping_cache:
+            log("    Reusing mapping from an identical earlier request")
+            mapping = _mapping_cache[key]
+        else:
+            log("    Calling LLM for mapping analysis...")
+            
+            llm_response = await call_llm(
+                [
+                    {"role": "system", "content": "You are a requirements engineering expert. Always respond in valid JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=OLLAMA_TEMPERATURE,
+                # JSON mode: Ollama constrains the reply to a single JSON object
+                response_format={"type": "json_object"}
+            )
+            
+            # JSON mode means the reply is the object itself, so it is
+            # parsed and checked against MappingResponse in one pass
+            try:
+                mapping = MappingResponse.model_validate_json(llm_response).model_dump(exclude_unset=True)
+            except ValidationError:
                 mapping = {"raw_response": llm_response}
-        except json.JSONDecodeError:
-            mapping = {"raw_response": llm_response}
+            
+            # Only a usable answer is worth reusing
+            if "mapping" in mapping:
+                _mapping_cache[key] = mapping
         
         # Create default mapping if LLM response wasn't parseable
         if "mapping" not in mapping:
@@ -621,10 +777,10 @@ Respond in JSON format:
                 "transformation_notes": "Most content maps directly. Some IEEE sections need to be synthesized from source content."
             }
         
-        log(f"    Generated {len(mapping.get('mapping', []))} mappings")
+        log("    Generated %d mappings", len(mapping.get("mapping", [])))
         
     except Exception as e:
-        log(f"    LLM error: {e}")
+        log("    LLM error: %s", e)
         mapping = {
             "mapping": [
                 {"source": "Project Overview", "target": "Introduction", "notes": "Standard mapping"},
@@ -674,8 +830,7 @@ def human_review_mapping(state: TransformState) -> dict:
     log("HUMAN REVIEW REQUIRED: Mapping Review")
     log("=" * 60)
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Human review requested: {datetime.now().isoformat()}")
+    processing_log = [f"Human review requested: {datetime.now().isoformat()}"]
     
     # Display the mapping for human review
     log("\n" + state.mapping_explanation)
@@ -714,12 +869,129 @@ def human_review_mapping(state: TransformState) -> dict:
 # Step 4: Transform Content (Apply Mapping)
 # ============================================================
 
+# Section-title keywords, each tagged with the handler it routes to. One
+# scan finds every keyword in a title; "non-functional" is matched whole so
+# its "functional" part never counts on its own. A bare "non" anywhere in
+# the title rules out the functional route, as it always has.
+_SECTION_KIND_RE = re.compile(r"""
+    (?P<overview>overview|project)
+  | (?P<non_functional>non-functional|non[ ]functional)
+  | (?P<non>non)
+  | (?P<functional>functional)
+  | (?P<constraints>constraint|assumption)
+  | (?P<acceptance>acceptance)
+""", re.VERBOSE)
+
+# When a title has keywords of several kinds, the first kind listed wins
+# (non-functional ahead of functional, so a title naming both keeps its NFRs)
+_SECTION_KIND_PRIORITY = ("overview", "non_functional", "functional", "constraints", "acceptance")
+
+
+@lru_cache(maxsize=64)
+def _section_kind(title: str) -> Optional[str]:
+    """Classify a source section title by its keywords (None if it has none)."""
+    kinds = {match.lastgroup for match in _SECTION_KIND_RE.finditer(title.lower())}
+    if "non" in kinds:
+        kinds.discard("functional")
+    return next((kind for kind in _SECTION_KIND_PRIORITY if kind in kinds), None)
+
+
+def _extract_text(item: dict) -> str:
+    """An item's text, or a requirement's description when it has no text."""
+    text = item.get("text")
+    return text if text is not None else item.get("description", "")
+
+
+def _item_texts(subsec: dict):
+    """Yield the non-empty "text" of each item in a subsection."""
+    return (text for item in subsec.get("items", ()) if (text := item.get("text")))
+
+
+def _transform_overview(section: dict, source: dict, transformed: dict):
+    """Project Overview → Introduction"""
+    for subsec in section.get("subsections", []):
+        subsec_title = subsec.get("title", "").lower()
+        
+        if "description" in subsec_title:
+            transformed["1_introduction"]["1_2_scope"] = " ".join(map(_extract_text, subsec.get("items", ())))
+        elif "objectives" in subsec_title:
+            transformed["2_overall_description"]["2_2_product_functions"] = list(_item_texts(subsec))
+        elif "stakeholders" in subsec_title:
+            transformed["2_overall_description"]["2_3_user_characteristics"] = list(_item_texts(subsec))
+
+
+def _transform_functional(section: dict, source: dict, transformed: dict):
+    """Functional Requirements → 3.2"""
+    # The parser only files ids starting with "FR-" here, so swap the prefix by slicing
+    for req in source.get("requirements", {}).get("functional", []):
+        req_id = req.get("id", "")
+        transformed["3_specific_requirements"]["3_2_functional_requirements"].append({
+            "id": "REQ-" + req_id[3:],
+            "description": req.get("description", ""),
+            "original_id": req_id
+        })
+
+
+# NFR id category → (path to its list in the transformed content, id prefix).
+# The category is read with one anchored match; SC is tried before S so
+# scalability ids no longer land in security.
+_NFR_ID_RE = re.compile(r"NFR-(SC|P|S|A)(?=-|$)")
+_NFR_BUCKETS = {
+    "P": (("3_specific_requirements", "3_3_performance_requirements"), "PERF-"),  # Performance
+    "S": (("3_specific_requirements", "3_5_system_attributes", "security"), "SEC-"),  # Security
+    "A": (("3_specific_requirements", "3_5_system_attributes", "availability"), "AVAIL-"),  # Availability
+    "SC": (("3_specific_requirements", "3_5_system_attributes", "reliability"), "SCALE-"),  # Scalability
+}
+
+
+def _transform_non_functional(section: dict, source: dict, transformed: dict):
+    """Non-Functional Requirements → 3.3, 3.5"""
+    for req in source.get("requirements", {}).get("non_functional", []):
+        req_id = req.get("id", "")
+        match = _NFR_ID_RE.match(req_id)
+        if not match:
+            continue
+        
+        path, prefix = _NFR_BUCKETS[match.group(1)]
+        target = transformed
+        for key in path:
+            target = target[key]
+        target.append({
+            "id": prefix + req_id[4:],  # the match guarantees the "NFR-" prefix
+            "description": req.get("description", "")
+        })
+
+
+def _transform_constraints(section: dict, source: dict, transformed: dict):
+    """Constraints & Assumptions → 2.4, 2.5"""
+    for subsec in section.get("subsections", []):
+        subsec_title = subsec.get("title", "").lower()
+        
+        if "constraint" in subsec_title:
+            transformed["2_overall_description"]["2_4_constraints"].extend(_item_texts(subsec))
+        elif "assumption" in subsec_title:
+            transformed["2_overall_description"]["2_5_assumptions"].extend(_item_texts(subsec))
+
+
+def _transform_acceptance(section: dict, source: dict, transformed: dict):
+    """Acceptance Criteria → Appendices"""
+    for subsec in section.get("subsections", []):
+        transformed["4_appendices"].extend(_item_texts(subsec))
+
+
+_SECTION_HANDLERS = {
+    "overview": _transform_overview,
+    "functional": _transform_functional,
+    "non_functional": _transform_non_functional,
+    "constraints": _transform_constraints,
+    "acceptance": _transform_acceptance,
+}
+
 def step4_transform(state: TransformState) -> dict:
     """Transform source content to target template structure."""
     log("\n[Step 4] Transforming content to target format...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 4 started: {datetime.now().isoformat()}")
+    processing_log = [f"Step 4 started: {datetime.now().isoformat()}"]
     
     source = state.source_parsed
     mapping = state.proposed_mapping
@@ -764,90 +1036,25 @@ def step4_transform(state: TransformState) -> dict:
     
     # Map source content to transformed structure
     for section in source.get("sections", []):
-        section_title = section.get("title", "").lower()
-        
-        # Project Overview → Introduction
-        if "overview" in section_title or "project" in section_title:
-            for subsec in section.get("subsections", []):
-                subsec_title = subsec.get("title", "").lower()
-                items_text = " ".join([str(item.get("text", item.get("description", ""))) for item in subsec.get("items", [])])
-                
-                if "description" in subsec_title:
-                    transformed["1_introduction"]["1_2_scope"] = items_text
-                elif "objectives" in subsec_title:
-                    transformed["2_overall_description"]["2_2_product_functions"] = [
-                        item.get("text", "") for item in subsec.get("items", []) if item.get("text")
-                    ]
-                elif "stakeholders" in subsec_title:
-                    transformed["2_overall_description"]["2_3_user_characteristics"] = [
-                        item.get("text", "") for item in subsec.get("items", []) if item.get("text")
-                    ]
-        
-        # Functional Requirements → 3.2
-        elif "functional" in section_title and "non" not in section_title:
-            for req in source.get("requirements", {}).get("functional", []):
-                transformed["3_specific_requirements"]["3_2_functional_requirements"].append({
-                    "id": req.get("id", "").replace("FR-", "REQ-"),
-                    "description": req.get("description", ""),
-                    "original_id": req.get("id", "")
-                })
-        
-        # Non-Functional Requirements → 3.3, 3.5
-        elif "non-functional" in section_title or "non functional" in section_title:
-            for req in source.get("requirements", {}).get("non_functional", []):
-                req_id = req.get("id", "")
-                req_desc = req.get("description", "")
-                
-                if "NFR-P" in req_id:  # Performance
-                    transformed["3_specific_requirements"]["3_3_performance_requirements"].append({
-                        "id": req_id.replace("NFR-", "PERF-"),
-                        "description": req_desc
-                    })
-                elif "NFR-S" in req_id:  # Security
-                    transformed["3_specific_requirements"]["3_5_system_attributes"]["security"].append({
-                        "id": req_id.replace("NFR-", "SEC-"),
-                        "description": req_desc
-                    })
-                elif "NFR-A" in req_id:  # Availability
-                    transformed["3_specific_requirements"]["3_5_system_attributes"]["availability"].append({
-                        "id": req_id.replace("NFR-", "AVAIL-"),
-                        "description": req_desc
-                    })
-                elif "NFR-SC" in req_id:  # Scalability
-                    transformed["3_specific_requirements"]["3_5_system_attributes"]["reliability"].append({
-                        "id": req_id.replace("NFR-", "SCALE-"),
-                        "description": req_desc
-                    })
-        
-        # Constraints & Assumptions → 2.4, 2.5
-        elif "constraint" in section_title or "assumption" in section_title:
-            for subsec in section.get("subsections", []):
-                subsec_title = subsec.get("title", "").lower()
-                items = [item.get("text", "") for item in subsec.get("items", []) if item.get("text")]
-                
-                if "constraint" in subsec_title:
-                    transformed["2_overall_description"]["2_4_constraints"].extend(items)
-                elif "assumption" in subsec_title:
-                    transformed["2_overall_description"]["2_5_assumptions"].extend(items)
-        
-        # Acceptance Criteria → Appendices
-        elif "acceptance" in section_title:
-            for subsec in section.get("subsections", []):
-                items = [item.get("text", "") for item in subsec.get("items", []) if item.get("text")]
-                transformed["4_appendices"].extend(items)
+        handler = _SECTION_HANDLERS.get(_section_kind(section.get("title", "")))
+        if handler:
+            handler(section, source, transformed)
     
-    # Count transformed items
-    fr_count = len(transformed["3_specific_requirements"]["3_2_functional_requirements"])
-    nfr_count = len(transformed["3_specific_requirements"]["3_3_performance_requirements"])
-    nfr_count += sum(len(v) for v in transformed["3_specific_requirements"]["3_5_system_attributes"].values() if isinstance(v, list))
+    # Count transformed items once; step 5 validates against these counts
+    specific = transformed["3_specific_requirements"]
+    fr_count = len(specific["3_2_functional_requirements"])
+    nfr_count = len(specific["3_3_performance_requirements"])
+    nfr_count += sum(map(len, specific["3_5_system_attributes"].values()))
     
-    log(f"    Transformed {fr_count} functional requirements")
-    log(f"    Transformed {nfr_count} non-functional requirements")
+    log("    Transformed %d functional requirements", fr_count)
+    log("    Transformed %d non-functional requirements", nfr_count)
     
     processing_log.append(f"Transformed {fr_count} FR, {nfr_count} NFR")
     
     return {
         "transformed_content": transformed,
+        "fr_count": fr_count,
+        "nfr_count": nfr_count,
         "current_step": "step4_transform",
         "processing_log": processing_log
     }
@@ -857,12 +1064,19 @@ def step4_transform(state: TransformState) -> dict:
 # Step 5: Validate Transformation
 # ============================================================
 
+# Sections that must not be empty, each with the top-level part it lives in
+_REQUIRED_SECTIONS = {
+    "1_2_scope": "1_introduction",
+    "2_2_product_functions": "2_overall_description",
+    "3_2_functional_requirements": "3_specific_requirements",
+}
+
+
 def step5_validate(state: TransformState) -> dict:
     """Validate the transformed content for completeness and correctness."""
     log("\n[Step 5] Validating transformation...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 5 started: {datetime.now().isoformat()}")
+    processing_log = [f"Step 5 started: {datetime.now().isoformat()}"]
     
     transformed = state.transformed_content
     source = state.source_parsed
@@ -877,7 +1091,7 @@ def step5_validate(state: TransformState) -> dict:
     
     # Check 1: All functional requirements mapped
     source_fr = len(source.get("requirements", {}).get("functional", []))
-    target_fr = len(transformed.get("3_specific_requirements", {}).get("3_2_functional_requirements", []))
+    target_fr = state.fr_count
     
     validation["checks"].append({
         "name": "Functional Requirements Coverage",
@@ -891,10 +1105,7 @@ def step5_validate(state: TransformState) -> dict:
     
     # Check 2: Non-functional requirements mapped
     source_nfr = len(source.get("requirements", {}).get("non_functional", []))
-    target_nfr = len(transformed.get("3_specific_requirements", {}).get("3_3_performance_requirements", []))
-    for attr in transformed.get("3_specific_requirements", {}).get("3_5_system_attributes", {}).values():
-        if isinstance(attr, list):
-            target_nfr += len(attr)
+    target_nfr = state.nfr_count
     
     validation["checks"].append({
         "name": "Non-Functional Requirements Coverage",
@@ -907,15 +1118,8 @@ def step5_validate(state: TransformState) -> dict:
         validation["warnings"].append(f"NFR count mismatch: {source_nfr} source vs {target_nfr} target")
     
     # Check 3: Required sections have content
-    required_sections = ["1_2_scope", "2_2_product_functions", "3_2_functional_requirements"]
-    for section in required_sections:
-        has_content = False
-        if section in transformed.get("1_introduction", {}):
-            has_content = bool(transformed["1_introduction"][section])
-        elif section in transformed.get("2_overall_description", {}):
-            has_content = bool(transformed["2_overall_description"][section])
-        elif section in transformed.get("3_specific_requirements", {}):
-            has_content = bool(transformed["3_specific_requirements"][section])
+    for section, parent in _REQUIRED_SECTIONS.items():
+        has_content = bool(transformed.get(parent, {}).get(section))
         
         validation["checks"].append({
             "name": f"Section {section} has content",
@@ -934,10 +1138,10 @@ def step5_validate(state: TransformState) -> dict:
     
     validation["passed"] = len(validation["errors"]) == 0
     
-    log(f"    Validation checks: {passed_checks}/{total_checks} passed")
-    log(f"    Coverage: {validation['coverage']['percentage']}%")
+    log("    Validation checks: %d/%d passed", passed_checks, total_checks)
+    log("    Coverage: %s%%", validation["coverage"]["percentage"])
     if validation["warnings"]:
-        log(f"    Warnings: {len(validation['warnings'])}")
+        log("    Warnings: %d", len(validation["warnings"]))
     
     processing_log.append(f"Validation: {validation['coverage']['percentage']}% coverage")
     
@@ -964,8 +1168,7 @@ def human_approval_final(state: TransformState) -> dict:
     log("HUMAN APPROVAL REQUIRED: Final Output Review")
     log("=" * 60)
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Final approval requested: {datetime.now().isoformat()}")
+    processing_log = [f"Final approval requested: {datetime.now().isoformat()}"]
     
     validation = state.validation_results
     
@@ -1012,151 +1215,166 @@ def step6_generate_output(state: TransformState) -> dict:
     """Generate the final transformed requirements document."""
     log("\n[Step 6] Generating final output document...")
     
-    processing_log = state.processing_log.copy()
-    processing_log.append(f"Step 6 started: {datetime.now().isoformat()}")
+    # One clock reading for the log entry, the header and the file name
+    now = datetime.now()
+    processing_log = [f"Step 6 started: {now.isoformat()}"]
     
     transformed = state.transformed_content
     source = state.source_parsed
-    
-    # Build the final document in IEEE 830 format
-    doc = []
-    doc.append("# IEEE 830 Software Requirements Specification")
-    doc.append(f"\n**Project:** {source.get('title', 'System')}")
-    doc.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    doc.append(f"**Run ID:** `{state.run_id}`")
-    doc.append(f"**Source Version:** {source.get('version', 'N/A')}")
-    doc.append(f"**Platform:** {state.platform_info.get('summary', 'Unknown')}")
-    doc.append("\n---\n")
+    # Bind each part of the transformed content once instead of re-indexing it per section
+    intro = transformed["1_introduction"]
+    overall = transformed["2_overall_description"]
+    spec = transformed["3_specific_requirements"]
+    sysattr = spec["3_5_system_attributes"]
+    
+    # Build the final document in IEEE 830 format. Every line is written
+    # with its newline into one buffer; fixed text goes in as single blocks.
+    buf = io.StringIO()
+    write = buf.write
+    write("# IEEE 830 Software Requirements Specification\n")
+    write(f"\n**Project:** {source.get('title', 'System')}\n")
+    write(f"**Generated:** {now.strftime('%Y-%m-%d %H:%M')}\n")
+    write(f"**Run ID:** `{state.run_id}`\n")
+    write(f"**Source Version:** {source.get('version', 'N/A')}\n")
+    write(f"**Platform:** {state.platform_info.get('summary', 'Unknown')}\n")
+    write("\n---\n\n")
     
     # 1. Introduction
-    doc.append("## 1. Introduction")
-    doc.append("\n### 1.1 Purpose")
-    doc.append(transformed["1_introduction"]["1_1_purpose"])
-    
-    doc.append("\n### 1.2 Scope")
-    doc.append(transformed["1_introduction"]["1_2_scope"] or "[Scope to be defined]")
-    
-    doc.append("\n### 1.3 Definitions, Acronyms, and Abbreviations")
-    doc.append("| Term | Definition |")
-    doc.append("|------|------------|")
-    doc.append("| CRM | Customer Relationship Management |")
-    doc.append("| SRS | Software Requirements Specification |")
-    doc.append("| FR | Functional Requirement |")
-    doc.append("| NFR | Non-Functional Requirement |")
-    doc.append("| API | Application Programming Interface |")
+    write("## 1. Introduction\n")
+    write("\n### 1.1 Purpose\n")
+    write(intro["1_1_purpose"] + "\n")
+    
+    write("\n### 1.2 Scope\n")
+    write((intro["1_2_scope"] or "[Scope to be defined]") + "\n")
+    
+    write(
+        "\n### 1.3 Definitions, Acronyms, and Abbreviations\n"
+        "| Term | Definition |\n"
+        "|------|------------|\n"
+        "| CRM | Customer Relationship Management |\n"
+        "| SRS | Software Requirements Specification |\n"
+        "| FR | Functional Requirement |\n"
+        "| NFR | Non-Functional Requirement |\n"
+        "| API | Application Programming Interface |\n"
+    )
     
-    doc.append("\n### 1.4 References")
-    doc.append("- IEEE 830-1998: Recommended Practice for Software Requirements Specifications")
-    doc.append("- Source Requirements Document v" + source.get("version", "1.0"))
+    write(
+        "\n### 1.4 References\n"
+        "- IEEE 830-1998: Recommended Practice for Software Requirements Specifications\n"
+    )
+    write("- Source Requirements Document v" + source.get("version", "1.0") + "\n")
     
-    doc.append("\n### 1.5 Overview")
-    doc.append(transformed["1_introduction"]["1_5_overview"])
+    write("\n### 1.5 Overview\n")
+    write(intro["1_5_overview"] + "\n")
     
     # 2. Overall Description
-    doc.append("\n## 2. Overall Description")
-    
-    doc.append("\n### 2.1 Product Perspective")
-    doc.append("This system is a new development intended to replace the existing legacy CRM solution.")
+    write(
+        "\n## 2. Overall Description\n"
+        "\n### 2.1 Product Perspective\n"
+        "This system is a new development intended to replace the existing legacy CRM solution.\n"
+    )
     
-    doc.append("\n### 2.2 Product Functions")
-    for func in transformed["2_overall_description"]["2_2_product_functions"]:
-        doc.append(f"- {func}")
+    write("\n### 2.2 Product Functions\n")
+    for func in overall["2_2_product_functions"]:
+        write(f"- {func}\n")
     
-    doc.append("\n### 2.3 User Characteristics")
-    for user in transformed["2_overall_description"]["2_3_user_characteristics"]:
-        doc.append(f"- {user}")
+    write("\n### 2.3 User Characteristics\n")
+    for user in overall["2_3_user_characteristics"]:
+        write(f"- {user}\n")
     
-    doc.append("\n### 2.4 Constraints")
-    for constraint in transformed["2_overall_description"]["2_4_constraints"]:
-        doc.append(f"- {constraint}")
+    write("\n### 2.4 Constraints\n")
+    for constraint in overall["2_4_constraints"]:
+        write(f"- {constraint}\n")
     
-    doc.append("\n### 2.5 Assumptions and Dependencies")
-    for assumption in transformed["2_overall_description"]["2_5_assumptions"]:
-        doc.append(f"- {assumption}")
+    write("\n### 2.5 Assumptions and Dependencies\n")
+    for assumption in overall["2_5_assumptions"]:
+        write(f"- {assumption}\n")
     
     # 3. Specific Requirements
-    doc.append("\n## 3. Specific Requirements")
-    
-    doc.append("\n### 3.1 External Interface Requirements")
-    doc.append("\n#### 3.1.1 User Interfaces")
-    doc.append("- Web-based interface accessible via modern browsers")
-    doc.append("- Mobile-responsive design for field access")
-    
-    doc.append("\n#### 3.1.2 Hardware Interfaces")
-    doc.append("- Standard desktop/laptop hardware")
-    doc.append("- Mobile devices (iOS, Android)")
-    
-    doc.append("\n#### 3.1.3 Software Interfaces")
-    doc.append("- ERP Integration (SAP)")
-    doc.append("- Email Integration (Microsoft 365)")
-    doc.append("- Active Directory for authentication")
-    
-    doc.append("\n#### 3.1.4 Communication Interfaces")
-    doc.append("- HTTPS/TLS 1.3 for all communications")
-    doc.append("- REST API for third-party integrations")
-    
-    doc.append("\n### 3.2 Functional Requirements")
-    for i, req in enumerate(transformed["3_specific_requirements"]["3_2_functional_requirements"], 1):
-        doc.append(f"\n**{req['id']}**: {req['description']}")
-        doc.append(f"  - _Original ID: {req.get('original_id', 'N/A')}_")
+    write(
+        "\n## 3. Specific Requirements\n"
+        "\n### 3.1 External Interface Requirements\n"
+        "\n#### 3.1.1 User Interfaces\n"
+        "- Web-based interface accessible via modern browsers\n"
+        "- Mobile-responsive design for field access\n"
+        "\n#### 3.1.2 Hardware Interfaces\n"
+        "- Standard desktop/laptop hardware\n"
+        "- Mobile devices (iOS, Android)\n"
+        "\n#### 3.1.3 Software Interfaces\n"
+        "- ERP Integration (SAP)\n"
+        "- Email Integration (Microsoft 365)\n"
+        "- Active Directory for authentication\n"
+        "\n#### 3.1.4 Communication Interfaces\n"
+        "- HTTPS/TLS 1.3 for all communications\n"
+        "- REST API for third-party integrations\n"
+    )
     
-    doc.append("\n### 3.3 Performance Requirements")
-    for req in transformed["3_specific_requirements"]["3_3_performance_requirements"]:
-        doc.append(f"- **{req['id']}**: {req['description']}")
+    write("\n### 3.2 Functional Requirements\n")
+    for req in spec["3_2_functional_requirements"]:
+        write(f"\n**{req['id']}**: {req['description']}\n")
+        write(f"  - _Original ID: {req.get('original_id', 'N/A')}_\n")
     
-    doc.append("\n### 3.4 Design Constraints")
-    doc.append("- Must run on Azure cloud infrastructure")
-    doc.append("- Must use PostgreSQL database")
-    doc.append("- Must support modern browsers (Chrome, Firefox, Edge, Safari)")
+    write("\n### 3.3 Performance Requirements\n")
+    for req in spec["3_3_performance_requirements"]:
+        write(f"- **{req['id']}**: {req['description']}\n")
     
-    doc.append("\n### 3.5 Software System Attributes")
+    write(
+        "\n### 3.4 Design Constraints\n"
+        "- Must run on Azure cloud infrastructure\n"
+        "- Must use PostgreSQL database\n"
+        "- Must support modern browsers (Chrome, Firefox, Edge, Safari)\n"
+    )
     
-    doc.append("\n#### 3.5.1 Reliability")
-    for req in transformed["3_specific_requirements"]["3_5_system_attributes"]["reliability"]:
-        doc.append(f"- **{req['id']}**: {req['description']}")
+    write("\n### 3.5 Software System Attributes\n")
     
-    doc.append("\n#### 3.5.2 Availability")
-    for req in transformed["3_specific_requirements"]["3_5_system_attributes"]["availability"]:
-        doc.append(f"- **{req['id']}**: {req['description']}")
+    write("\n#### 3.5.1 Reliability\n")
+    for req in sysattr["reliability"]:
+        write(f"- **{req['id']}**: {req['description']}\n")
     
-    doc.append("\n#### 3.5.3 Security")
-    for req in transformed["3_specific_requirements"]["3_5_system_attributes"]["security"]:
-        doc.append(f"- **{req['id']}**: {req['description']}")
+    write("\n#### 3.5.2 Availability\n")
+    for req in sysattr["availability"]:
+        write(f"- **{req['id']}**: {req['description']}\n")
     
-    doc.append("\n#### 3.5.4 Maintainability")
-    doc.append("- System shall support hot-patching without downtime")
-    doc.append("- System shall provide comprehensive logging for troubleshooting")
+    write("\n#### 3.5.3 Security\n")
+    for req in sysattr["security"]:
+        write(f"- **{req['id']}**: {req['description']}\n")
     
-    doc.append("\n#### 3.5.5 Portability")
-    doc.append("- System shall be containerized for deployment flexibility")
-    doc.append("- System shall not have vendor-specific dependencies")
+    write(
+        "\n#### 3.5.4 Maintainability\n"
+        "- System shall support hot-patching without downtime\n"
+        "- System shall provide comprehensive logging for troubleshooting\n"
+        "\n#### 3.5.5 Portability\n"
+        "- System shall be containerized for deployment flexibility\n"
+        "- System shall not have vendor-specific dependencies\n"
+    )
     
     # 4. Appendices
-    doc.append("\n## 4. Appendices")
-    doc.append("\n### Appendix A: Acceptance Criteria")
+    write("\n## 4. Appendices\n")
+    write("\n### Appendix A: Acceptance Criteria\n")
     for item in transformed["4_appendices"]:
-        doc.append(f"- {item}")
+        write(f"- {item}\n")
     
     # 5. Index
-    doc.append("\n## 5. Index")
-    doc.append("\n| Term | Section |")
-    doc.append("|------|---------|")
-    doc.append("| Authentication | 3.2 |")
-    doc.append("| Performance | 3.3 |")
-    doc.append("| Security | 3.5.3 |")
-    doc.append("| Availability | 3.5.2 |")
+    write(
+        "\n## 5. Index\n"
+        "\n| Term | Section |\n"
+        "|------|---------|\n"
+        "| Authentication | 3.2 |\n"
+        "| Performance | 3.3 |\n"
+        "| Security | 3.5.3 |\n"
+        "| Availability | 3.5.2 |\n"
+    )
     
-    # Join document
-    final_document = "\n".join(doc)
+    final_document = buf.getvalue()
     
     # Save to file with unique GUID in filename
-    output_file = generate_output_filename(state.run_id)
+    output_file = generate_output_filename(state.run_id, now=now)
     with open(output_file, "w", encoding="utf-8") as f:
         f.write(final_document)
     
-    log(f"    Generated document: {len(final_document)} characters")
-    log(f"    Run ID: {state.run_id}")
-    log(f"    Saved to: {output_file}")
+    log("    Generated document: %d characters", len(final_document))
+    log("    Run ID: %s", state.run_id)
+    log("    Saved to: %s", output_file)
     
     processing_log.append(f"Generated {output_file}")
     
@@ -1194,7 +1412,8 @@ def create_transformer_pipeline():
     Create the requirements transformation pipeline with human-in-the-loop.
     
     Flow:
-    START → step1_load_source → step2_load_template → step3_analyze_mapping 
+    START ┬→ step1_load_source   ┬→ step3_analyze_mapping   (steps 1 and 2 run in parallel)
+          └→ step2_load_template ┘
           → [human_review_mapping] → step4_transform → step5_validate 
           → [human_approval_final] → step6_generate_output → END
     """
@@ -1211,9 +1430,11 @@ def create_transformer_pipeline():
     builder.add_node("step6_generate_output", step6_generate_output)
     
     # Define flow
+    # Loading the source and the template are independent, so both start
+    # together and step 3 waits for both
     builder.add_edge(START, "step1_load_source")
-    builder.add_edge("step1_load_source", "step2_load_template")
-    builder.add_edge("step2_load_template", "step3_analyze_mapping")
+    builder.add_edge(START, "step2_load_template")
+    builder.add_edge(["step1_load_source", "step2_load_template"], "step3_analyze_mapping")
     builder.add_edge("step3_analyze_mapping", "human_review_mapping")
     
     # After human review, route based on approval
@@ -1248,6 +1469,28 @@ def create_transformer_pipeline():
 # Main Execution
 # ============================================================
 
+async def run_pipeline(pipeline, initial_state: TransformState) -> dict:
+    """Check Ollama and run the pipeline on one event loop, sharing the async client."""
+    log("Checking Ollama connection...")
+    try:
+        await get_async_client().models.list()
+        log("Ollama connected!\n")
+    except Exception as e:
+        log(f"Warning: Ollama not available ({e})")
+        log("Pipeline will use fallback mappings.\n")
+    
+    log("-" * 70)
+    log("Starting transformation pipeline...")
+    log("-" * 70)
+    
+    try:
+        return await pipeline.ainvoke(initial_state)
+    finally:
+        # Close the pooled connections while their event loop is still running
+        await get_async_client().close()
+        get_async_client.cache_clear()
+
+
 def main():
     """Run the requirements transformation pipeline."""
     
@@ -1273,22 +1516,9 @@ def main():
     log("\nThis pipeline transforms a generic requirements document to IEEE 830 format")
     log("with human-in-the-loop review at key decision points.\n")
     
-    # Check Ollama
-    log("Checking Ollama connection...")
-    try:
-        get_client().models.list()
-        log("Ollama connected!\n")
-    except Exception as e:
-        log(f"Warning: Ollama not available ({e})")
-        log("Pipeline will use fallback mappings.\n")
-    
-    # Create and run pipeline
+    # Create pipeline
     pipeline = create_transformer_pipeline()
     
-    log("-" * 70)
-    log("Starting transformation pipeline...")
-    log("-" * 70)
-    
     # Initialize state with run_id and platform info
     initial_state = TransformState(
         run_id=run_id,
@@ -1296,7 +1526,7 @@ def main():
     )
     
     try:
-        result = pipeline.invoke(initial_state)
+        result = asyncio.run(run_pipeline(pipeline, initial_state))
         
         log("\n" + "=" * 70)
         log("PIPELINE COMPLETE")
@@ -1316,9 +1546,7 @@ def main():
         log(f"Review the output at: {result.get('output_file', 'transformed_requirements_ieee830.md')}")
         
     except Exception as e:
-        log(f"\nPipeline error: {e}")
-        import traceback
-        traceback.print_exc()
+        _logger.exception("\nPipeline error: %s", e)
 
 
 if __name__ == "__main__":
@@ -22,6 +22,8 @@ import threading
 import time
 import uuid
 from datetime import datetime
+from functools import lru_cache
+import httpx
 from flask import Flask, render_template_string, jsonify, request, session
 from openai import OpenAI
 
@@ -90,8 +92,14 @@ def generate_run_id():
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434/v1")
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:1b")
 
+@lru_cache(maxsize=1)
 def get_client():
-    return OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+    # One client per process so requests reuse its keep-alive connections
+    return OpenAI(
+        base_url=OLLAMA_BASE_URL,
+        api_key="ollama",
+        http_client=httpx.Client(limits=httpx.Limits(max_keepalive_connections=20))
+    )
 
 # ============================================================
 # Sample Requirements File Management
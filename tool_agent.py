@@ -17,8 +17,12 @@ warnings.filterwarnings("ignore", category=UserWarning, module="langchain_core.*
 import sys
 import json
 import re
+import socket
+from functools import lru_cache
 from typing import Literal
+from urllib.parse import urlsplit
 from datetime import datetime
+import httpx
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 
@@ -113,8 +117,14 @@ class AgentState(BaseModel):
 # Step 3: Ollama Client with Tool Prompting
 # ============================================================
 
+@lru_cache(maxsize=1)
 def get_client() -> OpenAI:
-    return OpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama")
+    # One client per process so requests reuse its keep-alive connections
+    return OpenAI(
+        base_url=OLLAMA_BASE_URL,
+        api_key="ollama",
+        http_client=httpx.Client(limits=httpx.Limits(max_keepalive_connections=20))
+    )
 
 
 def build_tool_prompt() -> str:
@@ -346,11 +356,15 @@ def create_agent():
 # Step 7: Run Demo
 # ============================================================
 
+@lru_cache(maxsize=1)
 def check_ollama() -> bool:
+    """Check if Ollama is running (cached)."""
+    # Opening a TCP connection to Ollama's port is enough to know it's up
+    url = urlsplit(OLLAMA_BASE_URL)
     try:
-        get_client().models.list()
+        socket.create_connection((url.hostname, url.port), timeout=0.5).close()
         return True
-    except:
+    except OSError:
         return False
 
 
@@ -0,0 +1,15 @@
+"""
+WSGI entry point for the LangGraph Examples web UI.
+
+Run behind a production server so slow Ollama calls don't block each other:
+    gunicorn -w 4 -k gthread --threads 8 --timeout 120 wsgi:app
+
+On Windows (no gunicorn), waitress works too:
+    waitress-serve --threads 32 --port 8080 wsgi:app
+
+Set FLASK_SECRET_KEY so every worker can read the same session cookies.
+"""
+
+from app import app
+
+__all__ = ["app"]